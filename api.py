@@ -0,0 +1,248 @@
+"""
+Headless JSON API for clients that should not render the Streamlit UI (the campus mobile app).
+It runs the same data access, search index, ranking and summary caches as app.py, without the
+cost of a script rerun per request.
+
+    python api.py [port]        # API_PORT, default 8502; API_HOST, default 127.0.0.1
+
+    GET  /api/tiffins?q=&location=&food_type=&max_monthly=&limit=&cursor=
+         One page of tiffins: fuzzy name search when q is given, else the Find Tiffin filters.
+         Pass the returned cursor back for the next page; it is null after the last one.
+    GET  /api/tiffins/<id>             a tiffin with its rating aggregates and stored AI summary
+    GET  /api/top-rated?k=1            the best k tiffins of every Top Rated category
+    POST /api/tiffins/<id>/reviews     {"rating": 1-5, "review": "..."}, with HTTP Basic auth of
+                                       a student account (email and password)
+"""
+import asyncio
+import base64
+import binascii
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.web
+from tornado.ioloop import IOLoop
+
+import firestore_db
+import metrics
+import tiffin_service
+from auth import verify_login
+from gemini_ai import warm_up_gemini
+from summary_worker import get_summaries
+from tiffin_stats import averages
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", 8502))
+# Firestore and Gemini calls block, so handlers run them on this pool and keep the event loop free
+API_WORKERS = int(os.getenv("API_WORKERS", 16))
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+MAX_TOP_K = 10
+MAX_REVIEW_CHARS = 5000
+# Stored fields that are only there for queries
+HIDDEN_TIFFIN_FIELDS = {"location_tokens"}
+
+_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+
+
+def encode_cursor(cursor) -> str | None:
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str):
+    if not token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        raise tornado.web.HTTPError(400, "invalid cursor")
+
+
+def search_tiffins(name: str, filters: dict, limit: int, cursor) -> tuple:
+    """One page of ([(tiffin_id, data)], next cursor); the cursor is plain JSON in both modes."""
+    # Cursors come back from the client, so check their shape before they reach a query
+    if name:
+        if cursor is not None and (not isinstance(cursor, int) or isinstance(cursor, bool) or cursor < 0):
+            raise tornado.web.HTTPError(400, "cursor does not belong to a name search")
+        return tiffin_service.search_by_name(name, **filters, limit=limit, start=cursor or 0)
+
+    if cursor is not None:
+        try:
+            firestore_db.check_page_cursor(cursor, filters["max_monthly"])
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, f"invalid cursor: {e}")
+    rows, after = firestore_db.list_tiffins_page(limit, start_after=cursor, **filters)
+    if after is not None and not isinstance(after, dict):
+        # A Firestore snapshot: its order_by values and document id resume the query the same way
+        orders = firestore_db.page_orders(filters["max_monthly"])
+        after = {field: after.get(field) for field in orders} | {"__id__": after.id}
+    return rows, after
+
+
+def tiffin_json(tiffin_id: str, data: dict, stats: dict | None) -> dict:
+    avg_rating, avg_ai, avg_price = averages(stats)
+    return {
+        "id": tiffin_id,
+        **{k: v for k, v in data.items() if k not in HIDDEN_TIFFIN_FIELDS},
+        "reviews": (stats or {}).get("count", 0),
+        "avg_rating": round(avg_rating, 2),
+        "avg_ai": round(avg_ai, 2),
+        "avg_price": round(avg_price, 2) if avg_price is not None else None,
+    }
+
+
+def summary_json(summary: dict | None) -> dict | None:
+    if not summary:
+        return None
+    return {k: summary.get(k) for k in ("short_summary", "pros", "cons", "suggestion", "updated_at")}
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def write_json(self, payload, status: int = 200):
+        self.set_status(status)
+        # Firestore timestamps and the like go out as strings
+        self.finish(json.dumps(payload, default=str))
+
+    def write_error(self, status_code: int, **kwargs):
+        message = self._reason
+        exc = kwargs.get("exc_info", (None, None, None))[1]
+        if isinstance(exc, tornado.web.HTTPError) and exc.log_message:
+            message = exc.log_message
+        self.finish(json.dumps({"error": message}))
+
+    async def blocking(self, fn, *args, **kwargs):
+        return await IOLoop.current().run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+    def number_argument(self, name: str, low: float, high: float, default=None):
+        raw = self.get_query_argument(name, "").strip()
+        if not raw:
+            return default
+        try:
+            value = float(raw)
+        except ValueError:
+            raise tornado.web.HTTPError(400, f"{name} must be a number")
+        return min(max(value, low), high)
+
+
+class TiffinSearchHandler(JSONHandler):
+    async def get(self):
+        name = self.get_query_argument("q", "").strip()
+        filters = {
+            "food_type": self.get_query_argument("food_type", "").strip() or None,
+            "max_monthly": self.number_argument("max_monthly", 0, float("inf")) or None,
+            "location": self.get_query_argument("location", "").strip() or None,
+        }
+        limit = int(self.number_argument("limit", 1, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE))
+        cursor = decode_cursor(self.get_query_argument("cursor", ""))
+
+        rows, after = await self.blocking(search_tiffins, name, filters, limit, cursor)
+        # One batched read for the page's aggregates, as on the Find Tiffin cards
+        stats = await self.blocking(firestore_db.get_stats_many, [tid for tid, _ in rows])
+        self.write_json({
+            "tiffins": [tiffin_json(tid, data, stats.get(tid)) for tid, data in rows],
+            "cursor": encode_cursor(after),
+        })
+
+
+class TiffinHandler(JSONHandler):
+    async def get(self, tiffin_id: str):
+        data = (await self.blocking(firestore_db.get_tiffins, [tiffin_id])).get(tiffin_id)
+        if data is None:
+            raise tornado.web.HTTPError(404, "tiffin not found")
+        stats = await self.blocking(firestore_db.get_stats, tiffin_id)
+        # Stored summaries only; a stale or missing one is queued for the summary worker
+        summary = (await self.blocking(get_summaries, {tiffin_id: stats})).get(tiffin_id)
+        self.write_json({**tiffin_json(tiffin_id, data, stats), "summary": summary_json(summary)})
+
+
+class TopRatedHandler(JSONHandler):
+    async def get(self):
+        k = int(self.number_argument("k", 1, MAX_TOP_K, 1))
+        ranked = await self.blocking(tiffin_service.category_winners, k)
+        if not ranked:
+            self.write_json({"categories": {}})
+            return
+        winners, winner_stats = ranked
+        summaries = await self.blocking(get_summaries, winner_stats)
+        categories = {
+            category: [
+                {**entry, "blurb": ((summaries.get(entry["tid"]) or {}).get("category_blurbs") or {}).get(category)}
+                for entry in top
+            ]
+            for category, top in winners.items()
+        }
+        self.write_json({"categories": categories})
+
+
+class ReviewHandler(JSONHandler):
+    def _credentials(self) -> tuple:
+        scheme, _, token = self.request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "basic":
+            try:
+                email, sep, password = base64.b64decode(token).decode("utf-8").partition(":")
+                if sep:
+                    return email, password
+            except (binascii.Error, UnicodeDecodeError):
+                pass
+        self.set_header("WWW-Authenticate", 'Basic realm="right-tiffin"')
+        raise tornado.web.HTTPError(401, "student email and password required")
+
+    async def post(self, tiffin_id: str):
+        email, password = self._credentials()
+        try:
+            body = json.loads(self.request.body or b"{}")
+            rating = body["rating"]
+            review = str(body.get("review") or "").strip()
+        except (ValueError, KeyError, TypeError):
+            raise tornado.web.HTTPError(400, 'expected {"rating": 1-5, "review": "..."}')
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+            raise tornado.web.HTTPError(400, "rating must be a whole number from 1 to 5")
+        if not review or len(review) > MAX_REVIEW_CHARS:
+            raise tornado.web.HTTPError(400, f"review must be 1 to {MAX_REVIEW_CHARS} characters")
+
+        user = await self.blocking(verify_login, email, password)
+        if user is None:
+            self.set_header("WWW-Authenticate", 'Basic realm="right-tiffin"')
+            raise tornado.web.HTTPError(401, "wrong email or password")
+        if user.get("role") != "Student":
+            raise tornado.web.HTTPError(403, "only students can review")
+        data = (await self.blocking(firestore_db.get_tiffins, [tiffin_id], ["price_per_tiffin"])).get(tiffin_id)
+        if data is None:
+            raise tornado.web.HTTPError(404, "tiffin not found")
+
+        result = await self.blocking(
+            tiffin_service.submit_review, tiffin_id, user["user_id"], rating, review, data.get("price_per_tiffin"),
+        )
+        body = {k: result[k] for k in ("updated", "ai_score", "ai_summary")}
+        self.write_json(body, status=200 if result["updated"] else 201)
+
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/api/tiffins", TiffinSearchHandler),
+        (r"/api/tiffins/([^/]+)", TiffinHandler),
+        (r"/api/tiffins/([^/]+)/reviews", ReviewHandler),
+        (r"/api/top-rated", TopRatedHandler),
+    ])
+
+
+async def serve(port: int = API_PORT, host: str = API_HOST):
+    if os.getenv("LIVE_MIRROR_DISABLED") != "1":
+        await IOLoop.current().run_in_executor(_executor, firestore_db.start_live_mirror)
+    warm_up_gemini()
+    if os.getenv("METRICS_PORT"):
+        metrics.start_http_server(int(os.getenv("METRICS_PORT")))
+    make_app().listen(port, host)
+    print(f"Serving the tiffin API on http://{host}:{port}/api/")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(int(sys.argv[1]) if len(sys.argv) > 1 else API_PORT))
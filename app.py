@@ -1,18 +1,52 @@
+import html
+import os
 import streamlit as st
-import pandas as pd
-import altair as alt
-from firebase_config import db
+import firestore_db
+import metrics
+from image_service import VARIANTS, get_image_service
 from auth import register_user, login_user
+from tiffin_stats import averages
+from summary_worker import get_summaries
+import tiffin_service
 from gemini_ai import (
-    analyze_review, 
-    generate_one_line_reason, 
-    generate_short_summary, 
-    generate_pros_cons_simple
+    get_circuit_breaker,
+    get_model_registry,
+    warm_up_gemini,
 )
+# pandas, altair and ranking (NumPy) are imported inside the views that use them, so the
+# login page and Find Tiffin start without them
 
 # ================= PAGE CONFIG =================
 st.set_page_config(page_title="RIGHT TIFFIN FOR YOU", layout="wide", initial_sidebar_state="expanded")
 
+@st.cache_resource
+def gemini_client():
+    """One Gemini model registry per process; the model is resolved off the render path."""
+    warm_up_gemini()
+    return get_model_registry()
+
+
+gemini_client()
+
+# Tiffin cards fetched and rendered per "Load more" page
+TIFFIN_PAGE_SIZE = int(os.getenv("TIFFIN_PAGE_SIZE", 10))
+# Accounts that see the metrics debug panel
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+
+@st.cache_resource
+def start_live_mirror():
+    """One set of Firestore listeners per process; every session reads tiffins, reviews and stats from it."""
+    return firestore_db.start_live_mirror()
+
+
+if os.getenv("LIVE_MIRROR_DISABLED") != "1":
+    start_live_mirror()
+
+# Prometheus scrape endpoint on localhost, once per process
+if os.getenv("METRICS_PORT"):
+    metrics.start_http_server(int(os.getenv("METRICS_PORT")))
+
 # ================= THEME (light/dark) and CUSTOM CSS =================
 if "theme" not in st.session_state:
     st.session_state["theme"] = "light"
@@ -178,82 +212,106 @@ if "role" not in st.session_state:
 role = st.session_state["role"]
 user_id = st.session_state["user_id"]
 
-user_ref = db.collection("users").document(user_id)
-user_snap = user_ref.get()
-user_data = user_snap.to_dict() if user_snap.exists else {}
 
 
-def generate_category_positive_summary(category_key, tiffin_name, reviews_text, monthly_price, avg_rating, avg_ai):
+def load_user_profile(user_id: str) -> dict:
     """
-    Generate a positive one-line summary for a specific category based on student reviews using Gemini AI.
+    Return the logged-in user's profile. It is read from Firestore once per login and kept in
+    session state, so widget reruns cost no read; update_user_profile writes through to it.
     """
-    if not reviews_text or not reviews_text.strip():
-        return None
-    
-    # Limit review text to prevent token overflow
-    limited_reviews = reviews_text[:800] if len(reviews_text) > 800 else reviews_text
-    
-    # Category-specific prompts
-    category_prompts = {
-        "budget": f"""Based on these student reviews about '{tiffin_name}' (Monthly price: ₹{monthly_price}:
-Reviews: "{limited_reviews}"
+    cached = st.session_state.get("user_profile")
+    if not cached or cached["user_id"] != user_id:
+        cached = {"user_id": user_id, "data": firestore_db.get_user(user_id)}
+        st.session_state["user_profile"] = cached
+    return cached["data"]
 
-Write ONE enthusiastic positive sentence (10-15 words max) explaining why students find this the BEST BUDGET-FRIENDLY tiffin. Focus on value for money and affordability.""",
-        
-        "taste": f"""Based on these student reviews about '{tiffin_name}' :
-Reviews: "{limited_reviews}"
 
-Write ONE enthusiastic positive sentence (10-15 words max) explaining why students say this has the BEST TASTE. Focus on deliciousness and food quality.""",
-        
-        "overall": f"""Based on these student reviews about '{tiffin_name}' :
-Reviews: "{limited_reviews}"
+def update_user_profile(user_id: str, fields: dict):
+    firestore_db.update_user(user_id, fields)
+    cached = st.session_state.get("user_profile")
+    if cached and cached["user_id"] == user_id:
+        cached["data"].update(fields)
 
-Write ONE enthusiastic positive sentence (10-15 words max) explaining why students rate this as the BEST OVERALL tiffin. Consider taste, service, and value.""",
-        
-        "veg": f"""Based on these student reviews about '{tiffin_name}' :
-Reviews: "{limited_reviews}"
 
-Write ONE enthusiastic positive sentence (10-15 words max) explaining why students love this as the BEST VEGETARIAN option. Focus on veg food quality and variety.""",
-        
-        "nonveg": f"""Based on these student reviews about '{tiffin_name}' :
-Reviews: "{limited_reviews}"
+user_data = load_user_profile(user_id)
 
-Write ONE enthusiastic positive sentence (10-15 words max) explaining why students love this as the BEST NON-VEG option. Focus on meat quality and flavors."""
-    }
-    
-    prompt = category_prompts.get(category_key, category_prompts["overall"])
-    
-    full_prompt = f"""{prompt}
-
-RULES:
-1. Write ONLY one positive sentence
-2. Maximum 15 words
-3. Be enthusiastic and student-friendly
-4. NO negative points
-5. Start directly with the praise (don't say "Based on reviews...")
-6. Use emojis sparingly if appropriate
-
-Examples of good responses:
-- "Amazing homestyle taste at pocket-friendly prices students absolutely love!"
-- "Delicious fresh meals with generous portions that keep students coming back!"
-- "Perfect blend of taste, quantity and timely delivery every single day!"
-"""
-    
-    try:
-        # Use the existing generate_one_line_reason function
-        result = generate_one_line_reason(full_prompt)
-        if result and len(result.strip()) > 5:
-            # Clean up the result
-            cleaned = result.strip().strip('"\'')
-            # Ensure not too long
-            words = cleaned.split()
-            if len(words) > 18:
-                cleaned = ' '.join(words[:16]) + '...'
-            return cleaned
-    except Exception as e:
-        pass
-    
-    return None
+
+def load_tiffin_pages(state_key, query, search_name=""):
+    """
+    Return (rows, has_more) for the tiffin pages this session has loaded so far.
+    Without a name search, pages come straight from Firestore with the filters in `query`
+    (see firestore_db.list_tiffins_page) and only the start cursor of every loaded page is kept
+    in session state. A name search is answered by the in-memory search index instead.
+    New filters start again at page one.
+    """
+    filters = (tuple(sorted(query.items())), search_name)
+    state = st.session_state.get(state_key)
+    if not state or state["filters"] != filters:
+        state = {"filters": filters, "cursors": [None]}
+        st.session_state[state_key] = state
+
+    if search_name:
+        return _search_tiffin_pages(state, query, search_name)
+
+    rows = []
+    cursor = None
+    for page_no, start in enumerate(state["cursors"]):
+        batch, cursor = firestore_db.list_tiffins_page(TIFFIN_PAGE_SIZE, start_after=start, **query)
+        rows.extend(batch)
+        if page_no + 1 < len(state["cursors"]):
+            state["cursors"][page_no + 1] = cursor
+        if cursor is None:
+            del state["cursors"][page_no + 1:]
+            break
+    state["next"] = cursor
+    return rows, cursor is not None
+
+
+def _search_tiffin_pages(state, query, search_name):
+    """Rank tiffins by fuzzy name match, then fetch only the loaded pages' documents in batches."""
+    rows, state["next"] = tiffin_service.search_by_name(
+        search_name, **query, limit=len(state["cursors"]) * TIFFIN_PAGE_SIZE, batch_size=TIFFIN_PAGE_SIZE,
+    )
+    return rows, state["next"] is not None
+
+
+def render_image_carousel(image_list, variant: str, gap: int = 12):
+    """
+    Scrollable strip of a tiffin's photos. Each shows the small stored variant, lazily loaded over
+    a blurred inline placeholder (or a plain one while the photo is still being processed);
+    clicking a photo opens the provider's full-size original.
+    """
+    width, height = VARIANTS[variant]
+    service = get_image_service()
+    items = []
+    for img in image_list:
+        src = service.variant_url(img, variant)
+        placeholder = service.placeholder(img)
+        background = f"background:#e9ecef url('{placeholder}') center/cover no-repeat;" if placeholder else "background:#e9ecef;"
+        if src:
+            inner = f'<img src="{src}" loading="lazy" decoding="async" width="{width}" height="{height}" style="width:100%; height:100%; object-fit:cover; display:block;"/>'
+        else:
+            inner = '<div style="display:flex; align-items:center; justify-content:center; width:100%; height:100%; font-size:42px;">🍱</div>'
+        items.append(
+            f'<a href="{html.escape(img, quote=True)}" target="_blank" rel="noopener" '
+            f'style="flex:0 0 {width}px; scroll-snap-align:center; border-radius:12px; overflow:hidden; width:{width}px; height:{height}px; {background}">'
+            f'{inner}</a>'
+        )
+    st.markdown(
+        f'<div style="display:flex; gap:{gap}px; overflow-x:auto; scroll-snap-type:x mandatory; -webkit-overflow-scrolling:touch; padding:6px 0;">'
+        + ''.join(items)
+        + '</div>',
+        unsafe_allow_html=True,
+    )
+
+
+def render_load_more(state_key):
+    """Show the "Load more" button under a paginated tiffin list."""
+    state = st.session_state.get(state_key) or {}
+    if state.get("next") is not None:
+        if st.button("⬇️ Load more tiffins", key=f"{state_key}_more", use_container_width=True):
+            state["cursors"].append(state["next"])
+            st.rerun()
 
 
 def get_default_category_summary(category_key, entry):
@@ -280,116 +338,12 @@ def render_top_rated_section():
     st.markdown("---")
     st.markdown("## 🏆 Top Rated Tiffins (AI Powered)")
 
-    # Build combined ranking using ai_score (0-10), user rating (1-5), and price (lower is better)
-    reviews = db.collection("reviews").stream()
-    stats = {}
-    review_texts = {}  # Store review texts for AI summary generation
-    
-    for r in reviews:
-        d = r.to_dict()
-        tid = d.get("tiffin_id")
-        if tid not in stats:
-            stats[tid] = {"ai_scores": [], "ratings": [], "prices": []}
-            review_texts[tid] = []
-        stats[tid]["ai_scores"].append(d.get("ai_score", 0) or 0)
-        stats[tid]["ratings"].append(d.get("rating", 0) or 0)
-        if d.get("price") is not None:
-            stats[tid]["prices"].append(d.get("price"))
-        # Collect review texts for AI summary
-        if d.get("review"):
-            review_texts[tid].append(str(d.get("review")))
-
-    if stats:
-        # gather price range
-        prices = []
-        for v in stats.values():
-            prices.extend(v.get("prices", []))
-        min_price = min(prices) if prices else 0
-        max_price = max(prices) if prices else 0
-
-        combined = []
-        for tid, v in stats.items():
-            avg_ai = (sum(v["ai_scores"]) / len(v["ai_scores"])) if v["ai_scores"] else 0.0
-            avg_rating = (sum(v["ratings"]) / len(v["ratings"])) if v["ratings"] else 0.0
-            # scale rating 1-5 to 0-10
-            rating_scaled = ((avg_rating - 1) / 4) * 10 if avg_rating else 0.0
-            # price score: lower price gets higher score
-            price_val = (sum(v["prices"]) / len(v["prices"])) if v["prices"] else None
-            if price_val is None or min_price == max_price:
-                price_score = 5.0
-            else:
-                price_score = ((max_price - price_val) / (max_price - min_price)) * 10
-
-            combined_score = 0.5 * avg_ai + 0.3 * rating_scaled + 0.2 * price_score
-            combined.append((tid, combined_score, avg_ai, avg_rating, price_val))
-
-        combined_sorted = sorted(combined, key=lambda x: x[1], reverse=True)
-
-        # Build detailed entries with tiffin metadata for category selection
-        entries = []
-        for tid, combined_score, avg_ai, avg_rating, price_val in combined:
-            tdoc = db.collection("tiffins").document(tid).get()
-            if not tdoc or not tdoc.exists:
-                continue
-            tdata = tdoc.to_dict()
-            food_type = (tdata.get("food_type") or "").lower()
-            # prefer monthly price for budget calculations; fallback to review price
-            monthly = tdata.get("price_monthly") if tdata.get("price_monthly") is not None else price_val
-            entries.append({
-                "tid": tid,
-                "name": tdata.get("name", "Unknown"),
-                "combined": combined_score,
-                "avg_ai": avg_ai,
-                "avg_rating": avg_rating,
-                "price": price_val,
-                "monthly": monthly,
-                "food_type": food_type,
-                "reviews": review_texts.get(tid, []),  # Add review texts
-            })
+    # Ranked once per process (and per data change) for every session and the JSON API
+    ranked = tiffin_service.category_winners()
 
-        # Compute winners for each category
-        winner = {"budget": None, "taste": None, "overall": None, "veg": None, "nonveg": None}
-
-        # Precompute min/max monthly price for budget normalization
-        monthly_prices = [e["monthly"] for e in entries if e.get("monthly") is not None]
-        min_month = min(monthly_prices) if monthly_prices else None
-        max_month = max(monthly_prices) if monthly_prices else None
-
-        def monthly_price_score(p):
-            if p is None or min_month is None or max_month is None or min_month == max_month:
-                return 5.0
-            return ((max_month - p) / (max_month - min_month)) * 10
-
-        # Best Budget: low monthly cost but good rating (use monthly prices)
-        best_budget = None
-        best_budget_score = -1
-        for e in entries:
-            ps = monthly_price_score(e.get("monthly")) if e.get("monthly") is not None else 5.0
-            rating_scaled = ((e["avg_rating"] - 1) / 4) * 10 if e["avg_rating"] else 0.0
-            # Budget preference: 80% monthly price importance, 20% rating
-            bscore = 0.8 * ps + 0.2 * rating_scaled
-            if bscore > best_budget_score:
-                best_budget_score = bscore
-                best_budget = e
-        winner["budget"] = best_budget
-
-        # Best Taste: select by AI taste score (prefer entries with strong taste scores)
-        taste_candidates = [e for e in entries if (e.get("avg_ai") or 0) >= 7]
-        if taste_candidates:
-            winner["taste"] = max(taste_candidates, key=lambda x: x.get("avg_ai", 0))
-        else:
-            winner["taste"] = max(entries, key=lambda x: x.get("avg_ai", 0)) if entries else None
-
-        # Best Overall: previously computed combined
-        winner["overall"] = max(entries, key=lambda x: x["combined"]) if entries else None
-
-        # Best Veg / Jain
-        veg_entries = [e for e in entries if "veg" in (e.get("food_type") or "") and "non" not in (e.get("food_type") or "")]
-        winner["veg"] = max(veg_entries, key=lambda x: x["combined"]) if veg_entries else None
-
-        # Best Non-Veg
-        nonveg_entries = [e for e in entries if "non" in (e.get("food_type") or "")]
-        winner["nonveg"] = max(nonveg_entries, key=lambda x: x["combined"]) if nonveg_entries else None
+    if ranked:
+        winners, winner_stats = ranked
+        winner = {key_cat: (top[0] if top else None) for key_cat, top in winners.items()}
 
         # Render the five recommendation boxes
         labels = [
@@ -400,6 +354,14 @@ def render_top_rated_section():
             ("🍗 Best Non-Veg", "nonveg")
         ]
 
+        # Category blurbs are written by the summary worker in the same structured Gemini call
+        # as each tiffin's pros and cons; stale or missing ones are queued and show the default
+        winner_summaries = get_summaries(winner_stats)
+        ai_summaries = {
+            key_cat: ((winner_summaries.get(e["tid"]) or {}).get("category_blurbs") or {}).get(key_cat)
+            for key_cat, e in winner.items() if e
+        }
+
         cols5 = st.columns(5)
         for i, (label_text, key_cat) in enumerate(labels):
             e = winner.get(key_cat)
@@ -418,9 +380,6 @@ def render_top_rated_section():
                 avg_ai = e.get('avg_ai', 0.0)
                 overall = e.get('combined', 0.0)
                 monthly_price = e.get('monthly', 'N/A')
-                
-                # Combine all reviews for this tiffin
-                all_reviews = " ".join(e.get("reviews", []))
 
                 # color coding for AI score: >7 green, 4-7 yellow, <4.5 red
                 try:
@@ -446,15 +405,7 @@ def render_top_rated_section():
                 else:
                     user_color = "#dc2626"
 
-                # Generate AI-powered category-specific summary from student reviews
-                ai_positive_summary = generate_category_positive_summary(
-                    key_cat, 
-                    e.get("name", "Unknown"),
-                    all_reviews,
-                    monthly_price,
-                    avg_user,
-                    avg_ai
-                )
+                ai_positive_summary = ai_summaries.get(key_cat)
                 
                 # Fallback to default if AI fails
                 if not ai_positive_summary:
@@ -478,13 +429,170 @@ def render_top_rated_section():
     else:
         st.info("No ratings yet. Be the first to review!")
 
+@st.fragment
+def render_student_card(tid, data, t_stats, summary):
+    """
+    One Find Tiffin card with its review form and old reviews. Runs as a fragment: moving the
+    slider, typing a review or submitting it reruns only this card, not the whole page.
+    `t_stats` and `summary` come from the page's batched reads; after a submit the card shows the
+    stats the review transaction wrote (the live mirror only catches up through its listener) and
+    keeps them until the next full run, since fragment reruns reuse the arguments.
+    """
+    refreshed = st.session_state.get(f"card_stats_{tid}")
+    if refreshed is not None:
+        t_stats, summary = refreshed
+
+    st.markdown('<div class="tiffin-card">', unsafe_allow_html=True)
+    c1, c2 = st.columns([2, 3])
+
+    with c1:
+        image_list = [img for img in data.get("image_urls", []) if img]
+        if image_list:
+            render_image_carousel(image_list, "card")
+        else:
+            st.write("No images")
+
+    with c2:
+        st.markdown(f"### {data.get('name', 'Unknown Tiffin')}")
+        desc = data.get('description', '')
+        if desc:
+            short_desc = desc if len(desc.split()) <= 50 else ' '.join(desc.split()[:50]) + '...'
+            st.markdown(f"**Description:** {short_desc}")
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.markdown(f"📍 **Location:** {data.get('location', 'N/A')}")
+            st.markdown(f"📞 **Phone:** {data.get('phone', 'N/A')}")
+            delivery_display = ', '.join(data.get('delivery_locations', [data.get('location', 'N/A')]))
+            st.markdown(f"🚚 **Delivery Areas:** {delivery_display}")
+        with col_b:
+            st.markdown(f"🍽 **Type:** {data.get('food_type', 'N/A')}")
+
+        st.markdown("**Timings:**")
+        col_x, col_y = st.columns(2)
+        with col_x:
+            st.markdown(f"⏰ Morning: {data.get('timing_morning', 'N/A')}")
+        with col_y:
+            st.markdown(f"🌙 Night: {data.get('timing_night', 'N/A')}")
+
+        st.markdown(f"""
+        💰 **Pricing:**
+        - Monthly: ₹{data.get('price_monthly', 0)}
+        - Daily: ₹{data.get('price_daily', 0)}
+        - Per Tiffin: ₹{data.get('price_per_tiffin', 0)}
+        """)
+
+        # Filled in after the review form, so a submit in this run is already counted
+        averages_slot = st.empty()
+        summary_slot = st.empty()
+
+        rating = st.slider("⭐ Rate (1–5)", 1, 5, key=f"rate_{tid}")
+        review = st.text_area("💬 Write Review", key=f"rev_{tid}", height=80)
+        if st.button("✅ Submit Review", key=f"btn_{tid}", use_container_width=True):
+            result = tiffin_service.submit_review(tid, user_id, rating, review, data.get('price_per_tiffin', None))
+            if result["updated"]:
+                st.success("✅ Review updated!")
+            else:
+                st.success("✅ Review submitted!")
+
+            st.info(f"🤖 AI Score: {result['ai_score']}/10\n\n📝 {result['ai_summary']}")
+
+            # The stored summary stays until the next full run queues its recompute for the new stats
+            t_stats = result["stats"]
+            st.session_state[f"card_stats_{tid}"] = (t_stats, summary)
+
+        avg_user, avg_ai, _ = averages(t_stats)
+        ai_one_line = "No reviews yet. Be the first to review!"
+        if t_stats and t_stats.get("count"):
+            # Computed by the background summary worker; never calls Gemini during render
+            ai_one_line = summary.get("short_summary") if summary else "⏳ Summary pending..."
+
+        if avg_ai > 7:
+            ai_color = "#16a34a"
+        elif avg_ai >= 4:
+            ai_color = "#d97706"
+        else:
+            ai_color = "#dc2626"
+
+        if avg_user > 3.5:
+            user_color = "#16a34a"
+        elif avg_user >= 2.5:
+            user_color = "#d97706"
+        else:
+            user_color = "#dc2626"
+
+        averages_slot.markdown(
+            f"<p><strong>Avg user review:</strong> <span style='color:{user_color}; font-weight:600'>{avg_user:.1f}/5</span> • <strong>AI review:</strong> <span style='color:{ai_color}; font-weight:600'>{avg_ai:.1f}/10</span></p>",
+            unsafe_allow_html=True,
+        )
+        summary_slot.markdown(f"*AI summary:* {ai_one_line}")
+
+        with st.expander("📖 View Old Reviews"):
+            reviews = firestore_db.list_reviews(tid, ["rating", "review", "ai_summary"])
+            found = False
+            for rd in reviews:
+                st.markdown(f"⭐ **{rd.get('rating', 0)}/5** – {rd.get('review', '')}")
+                if rd.get('ai_summary'):
+                    st.info(f"🤖 AI: {rd.get('ai_summary')}")
+                found = True
+            if not found:
+                st.write("No reviews yet")
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+def view_selector(views: list, key: str) -> str:
+    """
+    Tab-style navigation that returns the chosen view, so the caller runs only that view's code
+    (st.tabs runs every tab body on each rerun and just hides the inactive ones).
+    """
+    return st.radio("View", views, key=key, horizontal=True, label_visibility="collapsed")
+
+
+def keep_widget_state(keys=(), prefixes=()):
+    """
+    Streamlit drops a widget's value after a run that does not draw it, which would reset the
+    filters and half-written reviews of a view the user has navigated away from. Copy the listed
+    widgets' values aside each run and put them back once their view is drawn again.
+    """
+    kept = st.session_state.setdefault("kept_widgets", {})
+    for k in list(st.session_state.keys()):
+        if k in keys or (isinstance(k, str) and k.startswith(tuple(prefixes))):
+            kept[k] = st.session_state[k]
+    for k, value in kept.items():
+        if k not in st.session_state:
+            st.session_state[k] = value
+
+
+def view_cache(name: str, compute):
+    """
+    Per-session memo for a view's computed data, so switching back to a view does not redo it.
+    Reused until the live mirror sees any tiffin, review or stats change; without the mirror it
+    is always recomputed.
+    """
+    version = firestore_db.data_version()
+    cached = st.session_state.get(f"view_cache_{name}")
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+    value = compute()
+    st.session_state[f"view_cache_{name}"] = (version, value)
+    return value
+
+
+PROVIDER_VIEWS = ["🔍 Browse Tiffins", "📊 Dashboard", "🏆 Top Rated", "👤 Profile"]
+PROVIDER_PROFILE_VIEWS = ["➕ Add New Tiffin", "📋 My Tiffins"]
+STUDENT_VIEWS = ["🔍 Find Tiffin", "📊 Dashboard", "🏆 Top Rated", "👤 Profile"]
+
 # ================= TIFFIN PROVIDER =================
 if role == "Tiffin Provider":
     st.markdown(f"### 👨‍🍳 Welcome, {user_data.get('name', 'Provider')}!")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["🔍 Browse Tiffins", "📊 Dashboard", "🏆 Top Rated", "👤 Profile"])
+    keep_widget_state(
+        ["prov_search_loc", "prov_search_name", "prov_search_food"],
+        ["add_"],
+    )
+    view = view_selector(PROVIDER_VIEWS, "prov_view")
 
-    with tab1:
+    if view == PROVIDER_VIEWS[0]:
         col1, col2 = st.columns(2)
         with col1:
             selected_location = st.text_input("🔍 Search by Location", key="prov_search_loc", placeholder="e.g., Downtown")
@@ -492,20 +600,14 @@ if role == "Tiffin Provider":
         with col2:
             selected_food = st.selectbox("🍽 Food Preference", ["All", "Veg", "Non-Veg", "Both"], key="prov_search_food")
 
-        tiffins = db.collection("tiffins").stream()
-
-        for t in tiffins:
-            data = t.to_dict()
-
-            if selected_location:
-                delivery_locs = data.get("delivery_locations") or [data.get("location", "")]
-                if not any(selected_location.lower() in (loc or "").lower() for loc in delivery_locs):
-                    continue
-            if search_name and search_name.lower() not in data.get("name", "").lower():
-                continue
-            if selected_food != "All" and data.get("food_type") != selected_food:
-                continue
+        # Food type and location are filtered by Firestore; name search uses the search index
+        query = {
+            "food_type": selected_food if selected_food != "All" else None,
+            "location": selected_location,
+        }
+        tiffins, _ = load_tiffin_pages("prov_pages", query, search_name)
 
+        for tid, data in tiffins:
             with st.container():
                 st.markdown('<div class="tiffin-card">', unsafe_allow_html=True)
                 c1, c2 = st.columns([2, 3])
@@ -513,11 +615,7 @@ if role == "Tiffin Provider":
                 with c1:
                     image_list = [img for img in data.get("image_urls", []) if img]
                     if image_list:
-                        imgs = []
-                        for img in image_list:
-                            imgs.append(f'<div style="flex:0 0 auto;scroll-snap-align:center;border-radius:12px;overflow:hidden;width:320px;height:420px;"><img src="{img}" style="width:320px;height:420px;object-fit:cover;border-radius:12px;display:block;"></div>')
-                        imgs_html = '<div style="display:flex;gap:10px;overflow-x:auto;scroll-snap-type:x mandatory;padding:6px 0;">' + ''.join(imgs) + '</div>'
-                        st.markdown(imgs_html, unsafe_allow_html=True)
+                        render_image_carousel(image_list, "portrait", gap=10)
                     else:
                         st.write("No images")
 
@@ -551,10 +649,9 @@ if role == "Tiffin Provider":
                     """)
 
                     with st.expander("📖 View Reviews"):
-                        reviews = db.collection("reviews").where("tiffin_id", "==", t.id).stream()
+                        reviews = firestore_db.list_reviews(tid, ["rating", "review", "ai_summary"])
                         found = False
-                        for r in reviews:
-                            rd = r.to_dict()
+                        for rd in reviews:
                             st.markdown(f"⭐ **{rd.get('rating', 0)}/5** – {rd.get('review', '')}")
                             if rd.get('ai_summary'):
                                 st.info(f"🤖 AI Summary: {rd.get('ai_summary')}")
@@ -564,49 +661,40 @@ if role == "Tiffin Provider":
                 
                 st.markdown('</div>', unsafe_allow_html=True)
 
-    with tab2:
+        render_load_more("prov_pages")
+
+    elif view == PROVIDER_VIEWS[1]:
         st.markdown("## 📊 Business Dashboard & Performance Analytics")
+        import altair as alt
+        import pandas as pd
 
-        t_docs = list(db.collection("tiffins").where("provider_id", "==", user_id).stream())
+        t_docs = firestore_db.list_provider_tiffins(user_id, firestore_db.TIFFIN_DASHBOARD_FIELDS)
         if not t_docs:
             st.info("You haven't added any tiffins yet. Add tiffins to see analytics.")
         else:
             rows = []
             total_reviews = 0
-            for t in t_docs:
-                td = t.to_dict() or {}
-                tid = t.id
-                revs = list(db.collection("reviews").where("tiffin_id", "==", tid).stream())
-                total_reviews += len(revs)
-                ratings = []
-                ai_scores = []
-                texts = []
-                for r in revs:
-                    rd = r.to_dict() or {}
-                    try:
-                        if rd.get("rating") is not None:
-                            ratings.append(float(rd.get("rating")))
-                    except Exception:
-                        pass
-                    try:
-                        if rd.get("ai_score") is not None:
-                            ai_scores.append(float(rd.get("ai_score")))
-                    except Exception:
-                        pass
-                    if rd.get("review"):
-                        texts.append(str(rd.get("review")))
-
-                avg_rating = round((sum(ratings) / len(ratings)) if ratings else 0.0, 2)
-                avg_ai = round((sum(ai_scores) / len(ai_scores)) if ai_scores else 0.0, 2)
-                
-                context = " ".join(texts).strip()
-                if context:
-                    try:
-                        pros, cons, suggestion = generate_pros_cons_simple(context, 5, 5)
-                    except Exception:
-                        pros = ["Error analyzing reviews"]
-                        cons = ["Error analyzing reviews"]
-                        suggestion = "Please try again later."
+            stats_map = firestore_db.get_stats_many([tid for tid, _ in t_docs])
+            # Computed by the background summary worker; never calls Gemini during render
+            summaries = get_summaries(stats_map)
+            for tid, td in t_docs:
+                t_stats = stats_map.get(tid)
+                review_count = (t_stats or {}).get("count", 0)
+                total_reviews += review_count
+                avg_rating, avg_ai, _ = averages(t_stats)
+                avg_rating = round(avg_rating, 2)
+                avg_ai = round(avg_ai, 2)
+
+                if review_count:
+                    summary = summaries.get(tid)
+                    if summary:
+                        pros = summary.get("pros") or []
+                        cons = summary.get("cons") or []
+                        suggestion = summary.get("suggestion", "")
+                    else:
+                        pros = ["⏳ Summary pending..."]
+                        cons = ["⏳ Summary pending..."]
+                        suggestion = "AI insights are being generated from your latest reviews. Check back shortly."
                 else:
                     pros = ["No reviews yet."]
                     cons = ["No reviews yet."]
@@ -619,7 +707,7 @@ if role == "Tiffin Provider":
                     "price_monthly": float(td.get("price_monthly") or 0),
                     "price_daily": float(td.get("price_daily") or 0),
                     "price_per_tiffin": float(td.get("price_per_tiffin") or 0),
-                    "total_reviews": len(revs),
+                    "total_reviews": review_count,
                     "avg_rating": avg_rating,
                     "avg_ai": avg_ai,
                     "pros": pros,
@@ -744,10 +832,10 @@ if role == "Tiffin Provider":
                     </div>
                     """, unsafe_allow_html=True)
 
-    with tab3:
+    elif view == PROVIDER_VIEWS[2]:
         render_top_rated_section()
 
-    with tab4:
+    elif view == PROVIDER_VIEWS[3]:
         st.subheader("✏️ Edit Your Profile")
         col1, col2 = st.columns(2)
         with col1:
@@ -758,7 +846,7 @@ if role == "Tiffin Provider":
         new_location = st.text_input("Location", value=user_data.get("location", ""), key="profile_location")
         
         if st.button("💾 Update Profile", use_container_width=True):
-            user_ref.update({"name": new_name, "phone": new_phone, "location": new_location})
+            update_user_profile(user_id, {"name": new_name, "phone": new_phone, "location": new_location})
             st.success("✅ Profile Updated!")
             st.rerun()
         
@@ -774,16 +862,20 @@ if role == "Tiffin Provider":
         st.markdown("---")
         st.subheader("🍱 Manage Your Tiffins")
         
-        sub_tab1, sub_tab2 = st.tabs(["➕ Add New Tiffin", "📋 My Tiffins"])
+        profile_view = view_selector(PROVIDER_PROFILE_VIEWS, "prov_profile_view")
         
-        with sub_tab1:
+        if profile_view == PROVIDER_PROFILE_VIEWS[0]:
             st.markdown("### Fill in Tiffin Details")
             col1, col2 = st.columns(2)
 
+            # Prefilled from the profile through session state only, since keep_widget_state also
+            # restores these keys and a widget must not get both a value= and a state value
+            st.session_state.setdefault("add_phone", user_data.get("phone", ""))
+            st.session_state.setdefault("add_loc", user_data.get("location", ""))
             with col1:
                 name = st.text_input("Tiffin Name", placeholder="e.g., Premium Lunch Box")
-                phone = st.text_input("Contact Number", value=user_data.get("phone", ""), key="add_phone")
-                location = st.text_input("Location", value=user_data.get("location", ""), key="add_loc")
+                phone = st.text_input("Contact Number", key="add_phone")
+                location = st.text_input("Location", key="add_loc")
                 delivery_locations = st.text_input("Delivery Locations (comma-separated)", placeholder="e.g., RGPV Campus, Downtown", key="add_delivery")
                 description = st.text_area("Short Description (max 50 words)", placeholder="Briefly describe this tiffin in up to 50 words", key="add_description", height=80)
                 food_type = st.selectbox("Food Type", ["Veg", "Non-Veg", "Both"], key="add_food")
@@ -804,7 +896,7 @@ if role == "Tiffin Provider":
                     else:
                         desc_words = (description or "").split()
                         short_desc = " ".join(desc_words[:50])
-                        db.collection("tiffins").add({
+                        firestore_db.add_tiffin({
                             "provider_id": user_id,
                             "name": name,
                             "phone": phone,
@@ -819,16 +911,16 @@ if role == "Tiffin Provider":
                             "image_urls": [img1, img2, img3],
                             "description": short_desc,
                         })
+                        # Start making thumbnails now so the first student to see the card gets them
+                        get_image_service().prefetch([img1, img2, img3])
                         st.success("✅ Tiffin added successfully!")
                         st.rerun()
 
-        with sub_tab2:
-            my_tiffins = db.collection("tiffins").where("provider_id", "==", user_id).stream()
+        elif profile_view == PROVIDER_PROFILE_VIEWS[1]:
+            my_tiffins = firestore_db.list_provider_tiffins(user_id)
             found_any = False
-            for t in my_tiffins:
+            for t_id, t_data in my_tiffins:
                 found_any = True
-                t_data = t.to_dict()
-                t_id = t.id
                 
                 with st.expander(f"🍱 {t_data.get('name', 'Unnamed')} - {t_data.get('location', 'No Location')}"):
                     with st.form(key=f"edit_{t_id}"):
@@ -858,7 +950,7 @@ if role == "Tiffin Provider":
                         col_update, col_delete = st.columns([1, 1])
                         with col_update:
                             if st.form_submit_button("💾 Update", use_container_width=True):
-                                db.collection("tiffins").document(t_id).update({
+                                firestore_db.update_tiffin(t_id, {
                                     "name": e_name,
                                     "phone": e_phone,
                                     "location": e_loc,
@@ -872,12 +964,13 @@ if role == "Tiffin Provider":
                                     "delivery_locations": [x.strip() for x in e_delivery.split(",") if x.strip()],
                                     "description": " ".join((e_description or "").split()[:50])
                                 })
+                                get_image_service().prefetch([e_img1, e_img2, e_img3])
                                 st.success("✅ Updated!")
                                 st.rerun()
                         
                         with col_delete:
                             if st.form_submit_button("🗑️ Delete", use_container_width=True):
-                                db.collection("tiffins").document(t_id).delete()
+                                firestore_db.delete_tiffin(t_id)
                                 st.success("✅ Deleted!")
                                 st.rerun()
 
@@ -888,195 +981,52 @@ if role == "Tiffin Provider":
 elif role == "Student":
     st.markdown(f"### 🎓 Welcome, {user_data.get('name', 'Student')}!")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["🔍 Find Tiffin", "📊 Dashboard", "🏆 Top Rated", "👤 Profile"])
+    keep_widget_state(
+        ["stud_search_loc", "stud_search_name", "stud_food", "stud_max_monthly"],
+        ["rate_", "rev_"],
+    )
+    view = view_selector(STUDENT_VIEWS, "stud_view")
 
-    with tab1:
+    if view == STUDENT_VIEWS[0]:
         col1, col2 = st.columns(2)
         with col1:
-            selected_location = st.text_input("🔍 Search by Location", placeholder="e.g., Downtown")
+            selected_location = st.text_input("🔍 Search by Location", key="stud_search_loc", placeholder="e.g., Downtown")
             search_name = st.text_input("🔎 Search by Tiffin Name", key="stud_search_name", placeholder="e.g., Premium Lunch Box")
            
         with col2:
-            selected_food = st.selectbox("🍽 Food Preference", ["All", "Veg", "Non-Veg", "Both"])
-            max_monthly = st.number_input("Max Monthly Price ₹ (0 = no filter)", min_value=0, value=0, step=100, key="stud_max_monthly")
-        tiffins = db.collection("tiffins").stream()
-
-        for t in tiffins:
-            data = t.to_dict()
-
-            if selected_location:
-                delivery_locs = data.get("delivery_locations") or [data.get("location", "")]
-                if not any(selected_location.lower() in (loc or "").lower() for loc in delivery_locs):
-                    continue
-            if search_name and search_name.lower() not in data.get("name", "").lower():
-                continue
-            if max_monthly and max_monthly > 0:
-                try:
-                    pm = float(data.get("price_monthly") or 0)
-                except Exception:
-                    pm = 0
-                if pm > float(max_monthly):
-                    continue
-            if selected_food != "All" and data.get("food_type") != selected_food:
-                continue
-
-            with st.container():
-                st.markdown('<div class="tiffin-card">', unsafe_allow_html=True)
-                c1, c2 = st.columns([2, 3])
-
-                with c1:
-                    image_list = [img for img in data.get("image_urls", []) if img]
-                    if image_list:
-                        imgs = []
-                        for img in image_list:
-                            imgs.append(f'<div style="flex:0 0 640px; scroll-snap-align:center; border-radius:12px; overflow:hidden; width:640px; height:360px;"><img src="{img}" style="width:100%; height:100%; object-fit:cover; border-radius:12px; display:block;"/></div>')
-                        imgs_html = (
-                            '<div style="display:flex; gap:12px; overflow-x:auto; scroll-snap-type:x mandatory; -webkit-overflow-scrolling:touch; padding:6px 0;">'
-                            + ''.join(imgs)
-                            + '</div>'
-                        )
-                        st.markdown(imgs_html, unsafe_allow_html=True)
-                    else:
-                        st.write("No images")
-
-                with c2:
-                    st.markdown(f"### {data.get('name', 'Unknown Tiffin')}")
-                    desc = data.get('description', '')
-                    if desc:
-                        short_desc = desc if len(desc.split()) <= 50 else ' '.join(desc.split()[:50]) + '...'
-                        st.markdown(f"**Description:** {short_desc}")
-                    col_a, col_b = st.columns(2)
-                    with col_a:
-                        st.markdown(f"📍 **Location:** {data.get('location', 'N/A')}")
-                        st.markdown(f"📞 **Phone:** {data.get('phone', 'N/A')}")
-                        delivery_display = ', '.join(data.get('delivery_locations', [data.get('location', 'N/A')]))
-                        st.markdown(f"🚚 **Delivery Areas:** {delivery_display}")
-                    with col_b:
-                        st.markdown(f"🍽 **Type:** {data.get('food_type', 'N/A')}")
-                    
-                    st.markdown("**Timings:**")
-                    col_x, col_y = st.columns(2)
-                    with col_x:
-                        st.markdown(f"⏰ Morning: {data.get('timing_morning', 'N/A')}")
-                    with col_y:
-                        st.markdown(f"🌙 Night: {data.get('timing_night', 'N/A')}")
-                    
-                    st.markdown(f"""
-                    💰 **Pricing:**
-                    - Monthly: ₹{data.get('price_monthly', 0)}
-                    - Daily: ₹{data.get('price_daily', 0)}
-                    - Per Tiffin: ₹{data.get('price_per_tiffin', 0)}
-                    """)
-
-                    rev_docs = list(db.collection("reviews").where("tiffin_id", "==", t.id).stream())
-                    avg_user = 0.0
-                    avg_ai = 0.0
-                    ai_one_line = "No reviews yet. Be the first to review!"
-                    if rev_docs:
-                        ratings = []
-                        ai_scores = []
-                        texts = []
-                        for rr in rev_docs:
-                            rd = rr.to_dict() or {}
-                            if rd.get("rating") is not None:
-                                try:
-                                    ratings.append(float(rd.get("rating") or 0))
-                                except Exception:
-                                    pass
-                            if rd.get("ai_score") is not None:
-                                try:
-                                    ai_scores.append(float(rd.get("ai_score") or 0))
-                                except Exception:
-                                    pass
-                            if rd.get("review"):
-                                texts.append(str(rd.get("review")))
-
-                        if ratings:
-                            avg_user = sum(ratings) / len(ratings)
-                        if ai_scores:
-                            avg_ai = sum(ai_scores) / len(ai_scores)
-
-                        context = " ".join(texts)
-                        if context:
-                            try:
-                                ai_one_line = generate_short_summary(context, min_words=5, max_words=15)
-                            except Exception:
-                                w = context.replace("\n", " ").split()
-                                ai_one_line = " ".join(w[:15]) if w else "No reviews yet."
-
-                    if avg_ai > 7:
-                        ai_color = "#16a34a"
-                    elif avg_ai >= 4:
-                        ai_color = "#d97706"
-                    else:
-                        ai_color = "#dc2626"
-
-                    if avg_user > 3.5:
-                        user_color = "#16a34a"
-                    elif avg_user >= 2.5:
-                        user_color = "#d97706"
-                    else:
-                        user_color = "#dc2626"
-
-                    st.markdown(
-                        f"<p><strong>Avg user review:</strong> <span style='color:{user_color}; font-weight:600'>{avg_user:.1f}/5</span> • <strong>AI review:</strong> <span style='color:{ai_color}; font-weight:600'>{avg_ai:.1f}/10</span></p>",
-                        unsafe_allow_html=True,
-                    )
-                    st.markdown(f"*AI summary:* {ai_one_line}")
-
-                    rating = st.slider("⭐ Rate (1–5)", 1, 5, key=f"rate_{t.id}")
-                    review = st.text_area("💬 Write Review", key=f"rev_{t.id}", height=80)
-                    if st.button("✅ Submit Review", key=f"btn_{t.id}", use_container_width=True):
-                        price_val = data.get('price_per_tiffin', None)
-                        ai_score, ai_summary = analyze_review(review, price_val)
-                        existing_rev = None
-                        for rr in db.collection("reviews").where("tiffin_id", "==", t.id).where("user_id", "==", user_id).stream():
-                            existing_rev = rr
-                            break
-
-                        review_payload = {
-                            "tiffin_id": t.id,
-                            "user_id": user_id,
-                            "rating": rating,
-                            "review": review,
-                            "ai_score": ai_score,
-                            "ai_summary": ai_summary,
-                            "price": price_val,
-                        }
-
-                        if existing_rev:
-                            db.collection("reviews").document(existing_rev.id).update(review_payload)
-                            st.success("✅ Review updated!")
-                        else:
-                            db.collection("reviews").add(review_payload)
-                            st.success("✅ Review submitted!")
-
-                        st.info(f"🤖 AI Score: {ai_score}/10\n\n📝 {ai_summary}")
-
-                    with st.expander("📖 View Old Reviews"):
-                        reviews = db.collection("reviews").where("tiffin_id", "==", t.id).stream()
-                        found = False
-                        for r in reviews:
-                            rd = r.to_dict()
-                            st.markdown(f"⭐ **{rd.get('rating', 0)}/5** – {rd.get('review', '')}")
-                            if rd.get('ai_summary'):
-                                st.info(f"🤖 AI: {rd.get('ai_summary')}")
-                            found = True
-                        if not found:
-                            st.write("No reviews yet")
-                
-                st.markdown('</div>', unsafe_allow_html=True)
+            selected_food = st.selectbox("🍽 Food Preference", ["All", "Veg", "Non-Veg", "Both"], key="stud_food")
+            max_monthly = st.number_input("Max Monthly Price ₹ (0 = no filter)", min_value=0, step=100, key="stud_max_monthly")
+
+        # Food type, price and location are filtered by Firestore; name search uses the search index
+        query = {
+            "food_type": selected_food if selected_food != "All" else None,
+            "max_monthly": max_monthly if max_monthly and max_monthly > 0 else None,
+            "location": selected_location,
+        }
+        visible, _ = load_tiffin_pages("stud_pages", query, search_name)
+
+        # One batched read each for the visible cards' aggregates and stored summaries
+        stats_map = firestore_db.get_stats_many([tid for tid, _ in visible])
+        summaries = get_summaries(stats_map)
+
+        for tid, data in visible:
+            # Drop any fresher copy a card kept after its own review submit; this run's batch is newer
+            st.session_state.pop(f"card_stats_{tid}", None)
+            render_student_card(tid, data, stats_map.get(tid), summaries.get(tid))
+
+        render_load_more("stud_pages")
     
-    with tab2:
+    elif view == STUDENT_VIEWS[1]:
         st.subheader("📊 Dashboard")
-        t_docs = list(db.collection("tiffins").stream())
-        if not t_docs:
-            st.info("No tiffins available right now.")
-        else:
-            total_tiffins = len(t_docs)
+
+        def student_dashboard():
+            import ranking
+
+            t_docs = firestore_db.list_tiffins(["name", "price_monthly"])
+            if not t_docs:
+                return None
             prices = []
-            for t in t_docs:
-                td = t.to_dict() or {}
+            for _, td in t_docs:
                 try:
                     p = float(td.get("price_monthly") or 0)
                 except Exception:
@@ -1084,41 +1034,36 @@ elif role == "Student":
                 if p:
                     prices.append(p)
 
-            avg_monthly = round(sum(prices) / len(prices), 2) if prices else 0.0
-
+            all_stats = firestore_db.get_all_stats()
+            frame = ranking.score(ranking.build_frame(dict(t_docs), all_stats))
+            return {
+                "total_tiffins": len(t_docs),
+                "avg_monthly": round(sum(prices) / len(prices), 2) if prices else 0.0,
+                "rev_count": sum(v.get("count", 0) for v in all_stats.values()),
+                "top_ai": ranking.entries(frame, ranking.top_k(frame["avg_ai"], 5)),
+            }
+
+        dash = view_cache("student_dashboard", student_dashboard)
+        if not dash:
+            st.info("No tiffins available right now.")
+        else:
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Available Tiffins", total_tiffins)
+                st.metric("Available Tiffins", dash["total_tiffins"])
             with col2:
-                st.metric("Avg Monthly Price", f"₹{avg_monthly}")
+                st.metric("Avg Monthly Price", f"₹{dash['avg_monthly']}")
             with col3:
-                rev_count = len(list(db.collection("reviews").stream()))
-                st.metric("Total Reviews", rev_count)
+                st.metric("Total Reviews", dash["rev_count"])
 
             st.markdown("---")
             st.markdown("### 🔝 Top AI-rated Tiffins")
-            ai_map = {}
-            for r in db.collection("reviews").stream():
-                rd = r.to_dict() or {}
-                tid = rd.get("tiffin_id")
-                if tid:
-                    ai_map.setdefault(tid, []).append(rd.get("ai_score", 0) or 0)
-
-            scored = []
-            for t in t_docs:
-                td = t.to_dict() or {}
-                tid = t.id
-                avg_ai = round(sum(ai_map.get(tid, [])) / len(ai_map.get(tid, [])), 1) if ai_map.get(tid) else 0.0
-                scored.append((tid, td.get("name", "Unknown"), avg_ai))
-
-            scored_sorted = sorted(scored, key=lambda x: x[2], reverse=True)[:5]
-            for tid, name, ai_score in scored_sorted:
-                st.write(f"**{name}** — AI Score: {ai_score}/10")
-
-    with tab3:
+            for e in dash["top_ai"]:
+                st.write(f"**{e['name']}** — AI Score: {round(e['avg_ai'], 1)}/10")
+
+    elif view == STUDENT_VIEWS[2]:
         render_top_rated_section()
 
-    with tab4:
+    elif view == STUDENT_VIEWS[3]:
         st.subheader("✏️ Edit Your Profile")
         col1, col2 = st.columns(2)
         with col1:
@@ -1129,7 +1074,7 @@ elif role == "Student":
         new_location = st.text_input("Location", value=user_data.get("location", ""), key="student_location")
         
         if st.button("💾 Update Profile", use_container_width=True):
-            user_ref.update({"name": new_name, "phone": new_phone, "location": new_location})
+            update_user_profile(user_id, {"name": new_name, "phone": new_phone, "location": new_location})
             st.success("✅ Profile Updated!")
             st.rerun()
 
@@ -1142,5 +1087,34 @@ elif role == "Student":
             st.success("✅ Logged out")
             st.rerun()
 
+# ================= ADMIN DEBUG PANEL =================
+if str(user_data.get("email", "")).lower() in ADMIN_EMAILS:
+    with st.expander("🛠️ Debug: Firestore & Gemini calls (this process)"):
+        breaker = get_circuit_breaker().snapshot()
+        st.caption(
+            f"Gemini circuit: **{breaker['state']}** · {breaker['recent_failures']}/{breaker['recent_calls']} "
+            f"recent calls failed or slow" + (f" · probing again in {breaker['retry_in_s']}s" if breaker["state"] == "open" else "")
+        )
+        rows = metrics.registry.rows()
+        if rows:
+            import pandas as pd
+
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        else:
+            st.info("No calls recorded yet.")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "⬇️ Prometheus metrics",
+                metrics.registry.prometheus_text(),
+                file_name="metrics.txt",
+                mime="text/plain",
+                use_container_width=True,
+            )
+        with col2:
+            if st.button("🔄 Reset counters", use_container_width=True, key="admin_reset_metrics"):
+                metrics.registry.reset()
+                st.rerun()
+
 # Close the overlay div
 st.markdown('</div>', unsafe_allow_html=True)
@@ -1,5 +1,5 @@
 import streamlit as st
-from firebase_config import db
+import firestore_db
 import hashlib
 import uuid
 
@@ -20,6 +20,14 @@ def _verify_password(stored: str, provided: str) -> bool:
     return hashlib.sha256((salt + provided).encode("utf-8")).hexdigest() == h
 
 
+def verify_login(email: str, password: str) -> dict | None:
+    """Return the account's login entry ({"user_id", "password", "role"}) if the password matches, else None."""
+    entry = firestore_db.get_login(email)
+    if entry is None or not entry.get("password"):
+        return None
+    return entry if _verify_password(entry["password"], password) else None
+
+
 def register_user():
     st.subheader("📝 Register")
 
@@ -38,20 +46,18 @@ def register_user():
             st.error("Passwords do not match")
             return
 
-        # check if email already exists
-        existing = list(db.collection("users").where("email", "==", email).stream())
-        if existing:
-            st.error("Email already registered. Please login or use another email.")
-            return
-
         hashed = _hash_password(password)
-        db.collection("users").add({
+        # Atomic create-if-absent on the email, so concurrent sign-ups cannot both succeed
+        user_id = firestore_db.create_user({
             "email": email,
             "name": name,
             "location": location,
             "role": role,
             "password": hashed,
         })
+        if user_id is None:
+            st.error("Email already registered. Please login or use another email.")
+            return
         st.success("Registered successfully. Please login.")
 
 
@@ -61,21 +67,15 @@ def login_user():
     password = st.text_input("Enter Password", type="password")
 
     if st.button("Login"):
-        users = db.collection("users").where("email", "==", email).stream()
-        found = False
-        for u in users:
-            found = True
-            ud = u.to_dict()
-            stored = ud.get("password", "")
-            if stored and _verify_password(stored, password):
-                st.session_state["role"] = ud.get("role")
-                st.session_state["email"] = email
-                st.session_state["user_id"] = u.id
-                st.success("Login successful")
-                return
-            else:
-                st.error("Wrong email or password")
-                return
-
-        if not found:
+        entry = firestore_db.get_login(email)
+        if entry is None:
             st.error("User not found")
+            return
+        stored = entry.get("password", "")
+        if stored and _verify_password(stored, password):
+            st.session_state["role"] = entry.get("role")
+            st.session_state["email"] = email
+            st.session_state["user_id"] = entry["user_id"]
+            st.success("Login successful")
+        else:
+            st.error("Wrong email or password")
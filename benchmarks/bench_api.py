@@ -0,0 +1,197 @@
+"""
+Load test of the JSON API (api.py): a local Tornado server on the in-memory Firestore and a stub
+Gemini (see harness.py), with the live mirror running as in production, takes concurrent requests.
+
+    python benchmarks/bench_api.py [--tiffins 1000] [--requests 500] [--concurrency 32] [--json results.json]
+
+Each endpoint is loaded in its own phase so Firestore reads and Gemini calls can be attributed:
+filtered search, name search, tiffin details, Top Rated and review submissions by the seeded
+students (last, since they change the data the others read). Per phase it reports errors,
+throughput, median and p95 latency, and reads and Gemini calls per request. Summary recomputes
+are counted instead of run, as in bench_reruns.py; compare the latencies with its per-rerun times.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from harness import LOCATIONS, NAME_WORDS, install_fakes, seed_catalogue
+
+db, genai_stub = install_fakes()
+
+import tornado.httpserver  # noqa: E402
+import tornado.netutil  # noqa: E402
+from tornado.httpclient import AsyncHTTPClient  # noqa: E402
+
+import api  # noqa: E402
+import firestore_db  # noqa: E402
+import gemini_ai  # noqa: E402
+import search_index  # noqa: E402
+import summary_worker  # noqa: E402
+from auth import _hash_password  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+class _QueueRecorder:
+    """Stands in for the background summary worker and counts the recomputes requests queue."""
+
+    def __init__(self):
+        self.queued = set()
+
+    def request(self, tiffin_id: str, fingerprint: str):
+        self.queued.add(tiffin_id)
+
+
+recorder = _QueueRecorder()
+summary_worker.get_worker = lambda: recorder
+
+
+def seed(n_tiffins: int) -> list:
+    """Seed the catalogue and give every student a password. Returns the students' emails."""
+    seed_catalogue(db, n_tiffins)
+    emails = []
+    for data in db._data["users"].values():
+        if data.get("role") == "Student":
+            data["password"] = _hash_password(PASSWORD)
+            emails.append(data["email"])
+    firestore_db.backfill_email_index()
+    db.counters.reset()
+    return emails
+
+
+def start_server() -> int:
+    """Serve api.make_app() on a free local port from its own event loop thread."""
+    ready = threading.Event()
+    bound = {}
+
+    def run():
+        async def main():
+            sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+            tornado.httpserver.HTTPServer(api.make_app()).add_sockets(sockets)
+            bound["port"] = sockets[0].getsockname()[1]
+            ready.set()
+            await asyncio.Event().wait()
+
+        asyncio.run(main())
+
+    threading.Thread(target=run, name="api-server", daemon=True).start()
+    ready.wait()
+    return bound["port"]
+
+
+def phases(n_tiffins: int, emails: list) -> dict:
+    """phase -> function(rng) returning (path, fetch kwargs) of one request."""
+    def tiffin_id(rng):
+        return f"tiffin-{rng.randrange(n_tiffins):05d}"
+
+    def review(rng):
+        email = rng.choice(emails)
+        token = base64.b64encode(f"{email}:{PASSWORD}".encode()).decode()
+        body = json.dumps({"rating": rng.randint(1, 5), "review": "tasty and fresh, sometimes late"})
+        return f"/api/tiffins/{tiffin_id(rng)}/reviews", {
+            "method": "POST", "body": body, "headers": {"Authorization": f"Basic {token}"},
+        }
+
+    return {
+        "search filters": lambda rng: ("/api/tiffins?" + urlencode({"food_type": "Veg", "location": rng.choice(LOCATIONS)}), {}),
+        "search name": lambda rng: ("/api/tiffins?" + urlencode({"q": rng.choice(NAME_WORDS)}), {}),
+        "tiffin": lambda rng: (f"/api/tiffins/{tiffin_id(rng)}", {}),
+        "top rated": lambda rng: ("/api/top-rated?k=3", {}),
+        "review": review,
+    }
+
+
+async def run_phase(client, base: str, make_request, n_requests: int, concurrency: int, rng) -> dict:
+    latencies = []
+    errors = 0
+    pending = iter(range(n_requests))
+
+    async def user():
+        nonlocal errors
+        for _ in pending:
+            path, kwargs = make_request(rng)
+            start = time.perf_counter()
+            response = await client.fetch(base + path, raise_error=False, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.code >= 400:
+                errors += 1
+
+    db.counters.reset()
+    genai_stub.reset()
+    recorder.queued = set()
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "rps": n_requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "reads_per_request": db.counters.doc_reads / n_requests,
+        "gemini_per_request": genai_stub.calls / n_requests,
+        "summaries_queued": len(recorder.queued),
+    }
+
+
+async def load_test(n_tiffins: int, n_requests: int, concurrency: int) -> list:
+    emails = seed(n_tiffins)
+    search_index._index = None
+    firestore_db.start_live_mirror()
+    base = f"http://127.0.0.1:{start_server()}"
+    client = AsyncHTTPClient(max_clients=concurrency)
+    rng = random.Random(7)
+
+    # One untimed request per endpoint builds the search index and the ranking cache
+    for make_request in phases(n_tiffins, emails).values():
+        path, kwargs = make_request(rng)
+        if kwargs.get("method") != "POST":
+            await client.fetch(base + path, raise_error=False)
+
+    results = []
+    for phase, make_request in phases(n_tiffins, emails).items():
+        row = await run_phase(client, base, make_request, n_requests, concurrency, rng)
+        results.append({"tiffins": n_tiffins, "phase": phase, "concurrency": concurrency, **row})
+    return results
+
+
+def print_table(results: list):
+    print(
+        f"{'tiffins':>7}  {'phase':<15} {'reqs':>5} {'errors':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'reads/req':>9} {'gemini/req':>10} {'queued':>6}"
+    )
+    for r in results:
+        print(
+            f"{r['tiffins']:>7}  {r['phase']:<15} {r['requests']:>5} {r['errors']:>6} {r['rps']:>8.1f} "
+            f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['reads_per_request']:>9.2f} "
+            f"{r['gemini_per_request']:>10.2f} {r['summaries_queued']:>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tiffins", type=int, default=1000, help="catalogue size")
+    parser.add_argument("--requests", type=int, default=500, help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=32, help="simultaneous clients")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Resolve the stub model up front so the health check is not billed to the first review
+    gemini_ai.get_model_registry().refresh().join()
+
+    results = asyncio.run(load_test(args.tiffins, args.requests, args.concurrency))
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Throughput of the keyword fallback engines: the implementations they replaced, the current
+ones (phrase tables built once, one scan per phrase), their batch APIs, and a single-pass
+combined-regex matcher for comparison.
+
+    python benchmarks/bench_fallback.py [num_reviews]
+
+Outputs are checked to be identical before anything is timed.
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gemini_ai import (  # noqa: E402
+    _SENTIMENT_WEIGHTS,
+    _price_adjustment,
+    fallback_ai,
+    fallback_ai_batch,
+    fallback_pros_cons,
+    fallback_pros_cons_batch,
+)
+
+
+def legacy_fallback_ai(review_text: str, price: float | None = None):
+    """fallback_ai as it was before the compiled matcher: one `in` scan per phrase."""
+    text = review_text.lower()
+
+    strong_positive = [
+        "very tasty", "excellent", "awesome", "amazing", "delicious",
+        "homemade", "fresh", "healthy", "perfect", "best", "love it",
+        "superb", "mouth watering"
+    ]
+
+    mild_positive = [
+        "good", "nice", "okay", "decent", "fine", "satisfactory",
+        "soft roti", "good taste", "less oil", "balanced spice",
+        "clean", "hygienic", "good quantity", "value for money"
+    ]
+
+    strong_negative = [
+        "worst", "very bad", "pathetic", "disgusting", "spoiled",
+        "smelly", "stale", "raw", "uncooked", "food poisoning"
+    ]
+
+    mild_negative = [
+        "bad", "average", "oily", "too spicy", "bland", "cold food",
+        "late", "delayed", "small quantity", "overpriced",
+        "not fresh", "sometimes late", "inconsistent"
+    ]
+
+    score = 5
+
+    for w in strong_positive:
+        if w in text:
+            score += 2
+
+    for w in mild_positive:
+        if w in text:
+            score += 1
+
+    for w in strong_negative:
+        if w in text:
+            score -= 2
+
+    for w in mild_negative:
+        if w in text:
+            score -= 1
+
+    if price is not None:
+        try:
+            p = float(price)
+            if p >= 3500:
+                score -= 2
+            elif p >= 2500:
+                score -= 1
+            elif p <= 2000:
+                score += 1
+        except Exception:
+            pass
+
+    score = max(0, min(score, 10))
+
+    return score, "Rule-based review sentiment analysis (fallback)"
+
+
+def legacy_fallback_pros_cons(context: str, max_pros: int = 5, max_cons: int = 5) -> tuple:
+    """fallback_pros_cons as it was before the compiled matcher."""
+    text = context.lower()
+
+    positive_keywords = {
+        "tasty": "Food is tasty and flavorful",
+        "delicious": "Delicious meals appreciated by students",
+        "fresh": "Fresh ingredients used",
+        "homemade": "Homemade taste that students love",
+        "good quality": "Good quality food",
+        "clean": "Clean and hygienic preparation",
+        "on time": "Timely delivery",
+        "generous portion": "Generous portion sizes",
+        "value for money": "Good value for money",
+        "soft roti": "Soft and fresh rotis",
+        "variety": "Good variety in menu",
+        "healthy": "Healthy food options",
+        "affordable": "Affordable pricing",
+        "hot food": "Food served hot",
+        "good taste": "Good taste overall"
+    }
+
+    negative_keywords = {
+        "late": "Sometimes late delivery",
+        "cold": "Food sometimes arrives cold",
+        "oily": "Food can be oily",
+        "spicy": "Sometimes too spicy",
+        "bland": "Food can be bland at times",
+        "small portion": "Portion sizes could be bigger",
+        "expensive": "Pricing could be better",
+        "inconsistent": "Inconsistent quality",
+        "stale": "Freshness could improve",
+        "delay": "Delivery delays reported",
+        "less quantity": "Quantity could be more",
+        "not fresh": "Freshness concerns",
+        "overpriced": "Feels overpriced to some",
+        "packaging": "Packaging needs improvement",
+        "average": "Average quality"
+    }
+
+    pros = []
+    cons = []
+
+    for keyword, description in positive_keywords.items():
+        if keyword in text and len(pros) < max_pros:
+            # Check it's not negated
+            idx = text.find(keyword)
+            snippet = text[max(0, idx-20):idx]
+            if not any(neg in snippet for neg in ["not ", "no ", "don't", "doesn't", "wasn't", "isn't"]):
+                pros.append(description)
+
+    for keyword, description in negative_keywords.items():
+        if keyword in text and len(cons) < max_cons:
+            cons.append(description)
+
+    if not pros:
+        pros = ["Food quality is generally acceptable"]
+    if not cons:
+        cons = ["No specific complaints identified"]
+
+    # Generate suggestion based on cons
+    if cons and cons[0] != "No specific complaints identified":
+        suggestion = f"Consider addressing: {cons[0].lower()}. Regular feedback collection can help improve service."
+    else:
+        suggestion = "Continue maintaining current standards and collect more student feedback for improvements."
+
+    return pros[:max_pros], cons[:max_cons], suggestion
+
+
+# All phrases in one alternation, longest first, inside a lookahead so every start position is
+# tried; shorter phrases starting at the same position are prefixes of the reported one.
+_COMBINED = re.compile("(?=(" + "|".join(re.escape(p) for p in sorted(_SENTIMENT_WEIGHTS, key=len, reverse=True)) + "))")
+_PREFIXES = {p: [q for q in _SENTIMENT_WEIGHTS if p.startswith(q)] for p in _SENTIMENT_WEIGHTS}
+
+
+def regex_fallback_ai(review_text: str, price=None):
+    """fallback_ai with a single combined-regex pass instead of one scan per phrase."""
+    text = review_text.lower()
+    found = {q for p in _COMBINED.findall(text) for q in _PREFIXES[p]}
+    score = 5 + sum(_SENTIMENT_WEIGHTS[p] for p in found) + _price_adjustment(price)
+    return max(0, min(score, 10)), "Rule-based review sentiment analysis (fallback)"
+
+
+VOCAB = [
+    "the", "food", "was", "really", "and", "roti", "dal", "rice", "sabzi", "delivery", "today",
+    "very tasty", "excellent", "delicious", "homemade", "fresh", "not fresh", "good", "nice", "okay",
+    "soft roti", "good taste", "less oil", "clean", "value for money", "worst", "very bad", "stale",
+    "raw", "bad", "average", "oily", "too spicy", "bland", "cold food", "late", "sometimes late",
+    "overpriced", "on time", "generous portion", "variety", "affordable", "hot food", "packaging",
+    "delay", "expensive", "isn't", "wasn't", "no", "not", "don't", "small portion", "less quantity",
+]
+
+
+def make_reviews(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(n):
+        words = [rng.choice(VOCAB) for _ in range(rng.randint(8, 60))]
+        text = " ".join(words).capitalize() + "."
+        reviews.append({"review": text, "price": rng.choice([None, 1800, 2200, 2600, 3600])})
+    return reviews
+
+
+def timed(label: str, fn, n: int):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {n / elapsed:12,.0f} reviews/s")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    reviews = make_reviews(n)
+    texts = [r["review"] for r in reviews]
+
+    legacy_scores = [legacy_fallback_ai(r["review"], r["price"]) for r in reviews]
+    assert [fallback_ai(r["review"], r["price"]) for r in reviews] == legacy_scores
+    assert fallback_ai_batch(reviews) == legacy_scores
+    assert [regex_fallback_ai(r["review"], r["price"]) for r in reviews] == legacy_scores
+    legacy_pc = [legacy_fallback_pros_cons(t) for t in texts]
+    assert [fallback_pros_cons(t) for t in texts] == legacy_pc
+    assert fallback_pros_cons_batch(texts) == legacy_pc
+    print(f"{n} reviews, outputs identical\n")
+
+    timed("fallback_ai (legacy)", lambda: [legacy_fallback_ai(r["review"], r["price"]) for r in reviews], n)
+    timed("fallback_ai", lambda: [fallback_ai(r["review"], r["price"]) for r in reviews], n)
+    timed("fallback_ai_batch", lambda: fallback_ai_batch(reviews), n)
+    timed("fallback_ai (combined regex)", lambda: [regex_fallback_ai(r["review"], r["price"]) for r in reviews], n)
+    timed("fallback_pros_cons (legacy)", lambda: [legacy_fallback_pros_cons(t) for t in texts], n)
+    timed("fallback_pros_cons", lambda: [fallback_pros_cons(t) for t in texts], n)
+    timed("fallback_pros_cons_batch", lambda: fallback_pros_cons_batch(texts), n)
+
+
+if __name__ == "__main__":
+    main()
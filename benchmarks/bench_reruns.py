@@ -0,0 +1,133 @@
+"""
+What one Streamlit rerun of app.py costs, per role and per view: Firestore document reads,
+queries, Gemini calls and wall time. The app runs headlessly through Streamlit's AppTest
+against the in-memory Firestore and a stub Gemini (see harness.py), on synthetic catalogues.
+
+    python benchmarks/bench_reruns.py [--sizes 10,100,1000] [--json results.json]
+
+Each role gets a "cold" run of its first view (new session, no stored summaries) and a "warm"
+rerun of the same session after the summary worker has caught up. Then the session switches
+to each other view ("open") and, after visiting the rest, back to it ("revisit"). Only the
+selected view runs, so every row is the cost of one screen. Summary recomputes are not run in
+the background here; the number a run queues is reported instead, so the counts stay deterministic.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from harness import PROVIDER_ID, REPO_DIR, STUDENT_ID, install_fakes, seed_catalogue
+
+db, genai_stub = install_fakes()
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import firestore_db  # noqa: E402
+import gemini_ai  # noqa: E402
+import search_index  # noqa: E402
+import summary_worker  # noqa: E402
+
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+# role -> (user id, session key of the view selector, views)
+ROLES = {
+    "Student": (STUDENT_ID, "stud_view", ["🔍 Find Tiffin", "📊 Dashboard", "🏆 Top Rated", "👤 Profile"]),
+    "Tiffin Provider": (PROVIDER_ID, "prov_view", ["🔍 Browse Tiffins", "📊 Dashboard", "🏆 Top Rated", "👤 Profile"]),
+}
+METRICS = ("doc_reads", "queries", "gemini_calls", "ms")
+
+
+class _QueueRecorder:
+    """Replaces the background summary worker so queued recomputes can be counted and run later."""
+
+    def __init__(self):
+        self.queued = {}
+
+    def request(self, tiffin_id: str, fingerprint: str):
+        self.queued[tiffin_id] = fingerprint
+
+    def drain(self):
+        for tiffin_id, fingerprint in self.queued.items():
+            summary = summary_worker.compute_summary(tiffin_id)
+            summary["fingerprint"] = fingerprint
+            firestore_db.set_summary(tiffin_id, summary)
+        self.queued = {}
+
+
+recorder = _QueueRecorder()
+summary_worker.get_worker = lambda: recorder
+
+
+def _measure(at: AppTest) -> dict:
+    db.counters.reset()
+    genai_stub.reset()
+    recorder.queued = {}
+    start = time.perf_counter()
+    at.run()
+    row = [db.counters.doc_reads, db.counters.queries, genai_stub.calls, (time.perf_counter() - start) * 1000]
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].value}")
+    return {"row": row, "summaries_queued": len(recorder.queued)}
+
+
+def run_size(n_tiffins: int) -> list:
+    # The live mirror is a process-wide cached resource; start it afresh on the new catalogue
+    firestore_db.stop_live_mirror()
+    st.cache_resource.clear()
+    seed_catalogue(db, n_tiffins)
+    search_index._index = None
+    results = []
+    for role, (user_id, view_key, views) in ROLES.items():
+        at = AppTest.from_file(APP_PATH, default_timeout=600)
+        at.session_state["role"] = role
+        at.session_state["user_id"] = user_id
+        plan = [("cold", views[0]), ("warm", views[0])]
+        plan += [("open", v) for v in views[1:]] + [("revisit", v) for v in views[1:]]
+        for run, view in plan:
+            at.session_state[view_key] = view
+            measured = _measure(at)
+            results.append({
+                "tiffins": n_tiffins,
+                "role": role,
+                "run": run,
+                "scope": view,
+                **dict(zip(METRICS, measured["row"])),
+                "summaries_queued": measured["summaries_queued"],
+            })
+            recorder.drain()
+    return results
+
+
+def print_table(results: list):
+    print(
+        f"{'tiffins':>7}  {'role':<15} {'run':<7} {'view':<20} "
+        f"{'reads':>6} {'queries':>7} {'gemini':>6} {'ms':>9} {'queued':>6}"
+    )
+    for r in results:
+        print(
+            f"{r['tiffins']:>7}  {r['role']:<15} {r['run']:<7} {r['scope']:<20} "
+            f"{r['doc_reads']:>6} {r['queries']:>7} {r['gemini_calls']:>6} {r['ms']:>9.1f} {r['summaries_queued']:>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated catalogue sizes")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Resolve the stub model up front so the health check is not billed to the first run
+    gemini_ai.get_model_registry().refresh().join()
+
+    results = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        results.extend(run_size(n))
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Cold start of app.py: time to first paint of a fresh process, and the imports that first run
+pays for. Every sample is a new interpreter that renders one screen through Streamlit's AppTest
+against the in-memory Firestore and a stub Gemini (see harness.py).
+
+    python benchmarks/bench_startup.py [--baseline REV] [--repeat 5] [--profile 15] [--json results.json]
+
+--baseline also measures git revision REV (checked out into a temporary worktree) for a
+before/after table. --profile lists the slowest top-level imports made during first paint,
+from `python -X importtime`. Streamlit itself is imported before the clock starts, as it is in a
+running server. So is firebase_admin (the in-memory Firestore needs it), and the fake skips
+secret parsing, credentials and the gRPC channel, so first paints against the real project are
+slower than these numbers.
+"""
+import argparse
+import json
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from harness import PROVIDER_ID, REPO_DIR, STUDENT_ID, install_fakes, seed_catalogue
+
+# name -> session state before the first run (an empty state is the login page)
+SCENARIOS = {
+    "login": {},
+    "student find": {"role": "Student", "user_id": STUDENT_ID, "stud_view": "🔍 Find Tiffin"},
+    "provider dashboard": {"role": "Tiffin Provider", "user_id": PROVIDER_ID, "prov_view": "📊 Dashboard"},
+}
+# Modules whose presence after first paint is reported
+HEAVY_MODULES = ("pandas", "altair", "numpy")
+FIRST_PAINT_MARKER = "--- first paint ---"
+
+
+def child(scenario: str, repo: str, data_path: str):
+    """Runs in the measured process: render one scenario and print its numbers as JSON."""
+    db, _ = install_fakes()
+    sys.path.insert(0, repo)
+    with open(data_path, "rb") as f:
+        db._data.update(pickle.load(f))
+
+    from streamlit.testing.v1 import AppTest
+
+    print(FIRST_PAINT_MARKER, file=sys.stderr, flush=True)
+    before = set(sys.modules)
+    start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(repo, "app.py"), default_timeout=120)
+    for key, value in SCENARIOS[scenario].items():
+        at.session_state[key] = value
+    at.run()
+    ms = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].value}")
+    print(json.dumps({
+        "ms": ms,
+        "modules_imported": len(set(sys.modules) - before),
+        "heavy": [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def _spawn(scenario: str, repo: str, data_path: str, importtime: bool = False) -> tuple:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        os.path.abspath(__file__), "--child", scenario, "--repo", repo, "--data", data_path,
+    ]
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{scenario} in {repo} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def import_profile(stderr: str, top: int) -> list:
+    """[(top-level package, cumulative ms)] imported after the first-paint marker, slowest first."""
+    totals = {}
+    lines = stderr.splitlines()
+    if FIRST_PAINT_MARKER in lines:
+        lines = lines[lines.index(FIRST_PAINT_MARKER) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        # Nested imports are indented; only count each top-level import once
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(cumulative) / 1000
+    return sorted(totals.items(), key=lambda kv: -kv[1])[:top]
+
+
+def measure_tree(label: str, repo: str, data_path: str, repeat: int, profile: int) -> list:
+    results = []
+    for scenario in SCENARIOS:
+        samples = [_spawn(scenario, repo, data_path)[0] for _ in range(repeat)]
+        row = {
+            "tree": label,
+            "scenario": scenario,
+            "ms": statistics.median(s["ms"] for s in samples),
+            "modules_imported": samples[0]["modules_imported"],
+            "heavy": samples[0]["heavy"],
+        }
+        if profile:
+            row["imports"] = import_profile(_spawn(scenario, repo, data_path, importtime=True)[1], profile)
+        results.append(row)
+    return results
+
+
+def print_table(results: list):
+    print(f"{'tree':<12} {'scenario':<20} {'first paint ms':>14} {'modules':>8}  heavy imports")
+    for r in results:
+        print(f"{r['tree']:<12} {r['scenario']:<20} {r['ms']:>14.1f} {r['modules_imported']:>8}  {', '.join(r['heavy']) or '-'}")
+    for r in results:
+        if r.get("imports"):
+            print(f"\nslowest imports during first paint: {r['tree']}, {r['scenario']}")
+            for package, ms in r["imports"]:
+                print(f"  {package:<32} {ms:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. HEAD~1")
+    parser.add_argument("--tiffins", type=int, default=100, help="catalogue size")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per scenario (median is reported)")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--repo", default=REPO_DIR, help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.repo, args.data)
+
+    # Seed once here and hand every child a copy, so seeding is not part of any first paint
+    db, _ = install_fakes()
+    seed_catalogue(db, args.tiffins)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "catalogue.pickle")
+        with open(data_path, "wb") as f:
+            pickle.dump(db._data, f)
+
+        results = []
+        if args.baseline:
+            worktree = os.path.join(tmp, "baseline")
+            subprocess.run(["git", "-C", REPO_DIR, "worktree", "add", "--detach", "-q", worktree, args.baseline], check=True)
+            try:
+                results += measure_tree(args.baseline, worktree, data_path, args.repeat, args.profile)
+            finally:
+                subprocess.run(["git", "-C", REPO_DIR, "worktree", "remove", "--force", worktree], check=True)
+        results += measure_tree("current", REPO_DIR, data_path, args.repeat, args.profile)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
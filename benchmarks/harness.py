@@ -0,0 +1,165 @@
+"""
+Offline test bed for the benchmarks: swaps in the in-memory Firestore for `firebase_config`
+and a deterministic stub for `google.generativeai`, then seeds synthetic catalogues.
+Call install_fakes() before importing any app module.
+"""
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+for _path in (REPO_DIR, BENCH_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from memory_firestore import MemoryFirestore  # noqa: E402
+
+STUB_RESPONSE = "Score: 7\nSummary: Fresh homemade food at a fair price."
+# Answer to structured (response_schema) prompts: a valid TiffinInsights document
+STUB_STRUCTURED_RESPONSE = json.dumps({
+    "summary": "Fresh homemade food at a fair price",
+    "pros": ["Tasty homemade food", "Good quantity"],
+    "cons": ["Sometimes late"],
+    "suggestion": "Keep delivery times consistent.",
+    "category_blurbs": {key: "Students love the fresh homemade taste every day!" for key in ("budget", "taste", "overall", "veg", "nonveg")},
+})
+
+
+class StubGenAI:
+    """Stands in for google.generativeai: counts generate_content calls and answers instantly."""
+
+    def __init__(self, response: str = STUB_RESPONSE):
+        self.response = response
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.calls_by_thread = {}
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.calls_by_thread = {}
+
+    def _record(self):
+        name = threading.current_thread().name
+        with self._lock:
+            self.calls += 1
+            self.calls_by_thread[name] = self.calls_by_thread.get(name, 0) + 1
+
+    def module(self) -> types.ModuleType:
+        stub = self
+
+        class GenerativeModel:
+            def __init__(self, model_name, **kwargs):
+                self.model_name = model_name
+
+            def generate_content(self, prompt, **kwargs):
+                from google.generativeai.types.generation_types import to_generation_config_dict
+
+                # Convert the config as the real SDK does, so a schema it rejects fails here too
+                config = to_generation_config_dict(kwargs.get("generation_config") or {})
+                stub._record()
+                structured = config.get("response_schema") is not None
+                return types.SimpleNamespace(text=STUB_STRUCTURED_RESPONSE if structured else stub.response)
+
+        mod = types.ModuleType("google.generativeai")
+        # Submodules such as types.generation_types still load from the installed SDK, on demand
+        mod.__path__ = list(importlib.util.find_spec("google.generativeai").submodule_search_locations)
+        mod.configure = lambda **kwargs: None
+        mod.list_models = lambda **kwargs: [
+            types.SimpleNamespace(name="models/stub-model", supported_generation_methods=["generateContent"])
+        ]
+        mod.GenerativeModel = GenerativeModel
+        return mod
+
+
+_installed = None
+
+
+def install_fakes():
+    """Install the fakes once per process and return (db, genai_stub)."""
+    global _installed
+    if _installed is None:
+        # Every Gemini call must reach the stub so it can be counted
+        os.environ["GEMINI_CACHE_DISABLED"] = "1"
+        db = MemoryFirestore()
+        firebase_config = types.ModuleType("firebase_config")
+        firebase_config.db = db
+        firebase_config.get_db = lambda: db
+        sys.modules["firebase_config"] = firebase_config
+
+        genai_stub = StubGenAI()
+        import google
+
+        google.generativeai = genai_stub.module()
+        sys.modules["google.generativeai"] = google.generativeai
+        _installed = (db, genai_stub)
+    return _installed
+
+
+LOCATIONS = ["RGPV Campus", "Indrapuri", "MP Nagar", "Ayodhya Bypass", "Anand Nagar", "Piplani"]
+FOOD_TYPES = ["Veg", "Non-Veg", "Both"]
+NAME_WORDS = ["Annapurna", "Maa Ki", "Ghar Ka", "Shree", "Spice", "Green", "Royal", "Desi", "Tasty", "Homely"]
+REVIEW_PHRASES = [
+    "very tasty and fresh", "homemade taste", "roti is soft", "sometimes late", "a bit oily",
+    "good quantity", "value for money", "too spicy for me", "clean packaging", "average dal",
+]
+
+STUDENT_ID = "student-0"
+PROVIDER_ID = "provider-0"
+
+
+def seed_catalogue(db: MemoryFirestore, n_tiffins: int, reviews_per_tiffin: int = 3, seed: int = 42):
+    """
+    Replace the store's contents with n_tiffins tiffins, a few reviews each and their tiffin_stats.
+    Seeding is not counted; the counters are reset afterwards.
+    """
+    import firestore_db
+
+    rng = random.Random(seed)
+    db._data.clear()
+    n_students = max(5, reviews_per_tiffin)
+    users = {PROVIDER_ID: {"name": "Provider", "role": "Tiffin Provider", "email": "provider@example.com"}}
+    for s in range(n_students):
+        users[f"student-{s}"] = {"name": f"Student {s}", "role": "Student", "email": f"student{s}@example.com"}
+    db.seed("users", users)
+
+    tiffins = {}
+    reviews = {}
+    for i in range(n_tiffins):
+        tid = f"tiffin-{i:05d}"
+        location = rng.choice(LOCATIONS)
+        delivery = sorted(set([location] + rng.sample(LOCATIONS, 2)))
+        monthly = rng.randrange(1500, 4000, 50)
+        tiffins[tid] = {
+            "name": f"{rng.choice(NAME_WORDS)} Tiffin {i}",
+            "provider_id": PROVIDER_ID if i % 10 == 0 else f"provider-{i % 7 + 1}",
+            "description": f"{rng.choice(REVIEW_PHRASES)} meals, daily menu",
+            "location": location,
+            "delivery_locations": delivery,
+            "location_tokens": firestore_db.location_tokens(location, delivery),
+            "food_type": rng.choice(FOOD_TYPES),
+            "price_monthly": monthly,
+            "price_daily": round(monthly / 25),
+            "price_per_tiffin": round(monthly / 50),
+            "image_urls": [],
+        }
+        for r in range(reviews_per_tiffin):
+            reviews[f"{tid}-r{r}"] = {
+                "tiffin_id": tid,
+                "user_id": f"student-{r}",
+                "rating": rng.randint(2, 5),
+                "review": ", ".join(rng.sample(REVIEW_PHRASES, 3)),
+                "ai_score": rng.randint(3, 9),
+                "ai_summary": "Fresh homemade food at a fair price.",
+                "price": tiffins[tid]["price_per_tiffin"],
+            }
+    db.seed("tiffins", tiffins)
+    db.seed("reviews", reviews)
+    firestore_db.rebuild_all_stats()
+    firestore_db.backfill_email_index()
+    db.counters.reset()
@@ -0,0 +1,426 @@
+"""
+In-memory stand-in for the subset of the google-cloud-firestore client the app uses.
+It counts document reads, queries and writes, so benchmarks can report what each page costs.
+"""
+import copy
+import datetime
+import itertools
+import threading
+import uuid
+from firebase_admin import firestore
+
+_lock = threading.RLock()
+
+
+class Counters:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.doc_reads = 0
+        self.queries = 0
+        self.gets = 0
+        self.writes = 0
+
+    def snapshot(self) -> dict:
+        return {"doc_reads": self.doc_reads, "queries": self.queries, "gets": self.gets, "writes": self.writes}
+
+
+def _resolve_transforms(data: dict) -> dict:
+    out = {}
+    for k, v in data.items():
+        if v is firestore.SERVER_TIMESTAMP:
+            v = datetime.datetime.now(datetime.timezone.utc)
+        out[k] = copy.deepcopy(v)
+    return out
+
+
+def _field(data: dict, path: str):
+    cur = data
+    for part in path.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return cur
+
+
+def _project(data: dict, fields) -> dict:
+    if not fields:
+        return copy.deepcopy(data)
+    out = {}
+    for f in fields:
+        v = _field(data, f)
+        if v is not None:
+            out[f] = copy.deepcopy(v)
+    return out
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = _project(data, fields) if data is not None else None
+        # Full document kept for cursor comparisons regardless of field masks
+        self._sort_data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _field(self._data or {}, field_path)
+
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._collection)
+
+    def _store(self):
+        return self._client._data.setdefault(self._collection, {})
+
+    def get(self, field_paths=None, transaction=None):
+        with _lock:
+            self._client.counters.gets += 1
+            self._client.counters.doc_reads += 1
+            return DocumentSnapshot(self, self._store().get(self.id), field_paths)
+
+    def set(self, data, merge=False):
+        with _lock:
+            self._client.counters.writes += 1
+            data = _resolve_transforms(data)
+            if merge and self.id in self._store():
+                self._store()[self.id].update(data)
+            else:
+                self._store()[self.id] = data
+            self._client._notify(self._collection, self.id)
+
+    def create(self, data):
+        with _lock:
+            if self.id in self._store():
+                from google.api_core.exceptions import AlreadyExists
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            self.set(data)
+
+    def update(self, data):
+        with _lock:
+            if self.id not in self._store():
+                from google.api_core.exceptions import NotFound
+                raise NotFound(f"No document to update: {self.path}")
+            self._client.counters.writes += 1
+            self._store()[self.id].update(_resolve_transforms(data))
+            self._client._notify(self._collection, self.id)
+
+    def delete(self):
+        with _lock:
+            self._client.counters.writes += 1
+            existed = self._store().pop(self.id, None) is not None
+            if existed:
+                self._client._notify(self._collection, self.id)
+
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a is not None and a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(x in a for x in b),
+}
+
+
+class Query:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **kw):
+        args = dict(filters=self._filters, orders=self._orders, limit=self._limit, cursor=self._cursor, fields=self._fields)
+        args.update(kw)
+        return Query(self._client, self._collection, **args)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def _sort_key(self, doc_id, data):
+        key = []
+        for field, _ in self._effective_orders():
+            v = doc_id if field == "__name__" else _field(data, field)
+            # None sorts first, like Firestore's null ordering
+            key.append((v is not None, v))
+        return key
+
+    def _cursor_key(self):
+        """The cursor as a sort key: a snapshot's values, or a dict of order_by values (may stop early)."""
+        if isinstance(self._cursor, DocumentSnapshot):
+            return self._sort_key(self._cursor.id, self._cursor._sort_data or {})
+        key = []
+        for field, _ in self._effective_orders()[:len(self._cursor)]:
+            v = self._cursor[field]
+            if field == "__name__":
+                v = getattr(v, "id", v)
+            key.append((v is not None, v))
+        return key
+
+    def _is_after(self, key, cursor_key):
+        for (_, direction), a, b in zip(self._effective_orders(), key, cursor_key):
+            if a != b:
+                return a < b if direction == "DESCENDING" else a > b
+        return False
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        if not any(f == "__name__" for f, _ in orders):
+            orders.append(("__name__", orders[-1][1] if orders else "ASCENDING"))
+        return orders
+
+    def _matches(self, data):
+        return all(_OPS[op](_field(data, f), v) for f, op, v in self._filters)
+
+    def _run(self):
+        store = self._client._data.get(self._collection, {})
+        rows = [(doc_id, data) for doc_id, data in store.items() if self._matches(data)]
+        for i, (_, direction) in reversed(list(enumerate(self._effective_orders()))):
+            rows.sort(key=lambda row, i=i: self._sort_key(*row)[i], reverse=(direction == "DESCENDING"))
+        if self._cursor is not None:
+            # Resume after the cursor's values, so it works even if its document is gone
+            cursor_key = self._cursor_key()
+            rows = [row for row in rows if self._is_after(self._sort_key(*row), cursor_key)]
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        return rows
+
+    def stream(self, transaction=None):
+        with _lock:
+            self._client.counters.queries += 1
+            rows = self._run()
+            # Firestore bills one read for a query that returns nothing
+            self._client.counters.doc_reads += max(1, len(rows))
+            coll = CollectionReference(self._client, self._collection)
+            snaps = [DocumentSnapshot(coll.document(doc_id), data, self._fields) for doc_id, data in rows]
+        return iter(snaps)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+    def on_snapshot(self, callback):
+        return self._client._listen(self, callback)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, collection):
+        super().__init__(client, collection)
+        self.id = collection
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return datetime.datetime.now(datetime.timezone.utc), ref
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: ref.set(data, merge=merge))
+
+    def create(self, ref, data):
+        self._ops.append(lambda: ref.create(data))
+
+    def update(self, ref, data):
+        self._ops.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self._ops.append(ref.delete)
+
+    def commit(self):
+        with _lock:
+            for op in self._ops:
+                op()
+            self._ops = []
+
+
+class Transaction(WriteBatch):
+    """Serializable by construction: the whole attempt runs under the client lock."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        _lock.acquire()
+        self._id = next(self._ids)
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._id = None
+            _lock.release()
+
+    def _rollback(self):
+        self._ops = []
+        if self._id is not None:
+            self._id = None
+            _lock.release()
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+    def get_all(self, references):
+        return self._client.get_all(references)
+
+
+class Watch:
+    def __init__(self, client, query, callback):
+        self._client = client
+        self._query = query
+        self._callback = callback
+        self._known = {}
+        self._fired = False
+
+    def _fire(self):
+        from google.cloud.firestore_v1.watch import ChangeType
+        with _lock:
+            rows = dict(self._query._run())
+        coll = CollectionReference(self._client, self._query._collection)
+        changes = []
+        for doc_id, data in rows.items():
+            if doc_id not in self._known:
+                changes.append(_Change(ChangeType.ADDED, DocumentSnapshot(coll.document(doc_id), data)))
+            elif self._known[doc_id] != data:
+                changes.append(_Change(ChangeType.MODIFIED, DocumentSnapshot(coll.document(doc_id), data)))
+        for doc_id, data in self._known.items():
+            if doc_id not in rows:
+                changes.append(_Change(ChangeType.REMOVED, DocumentSnapshot(coll.document(doc_id), data)))
+        self._known = copy.deepcopy(rows)
+        # Listeners are billed one read per added or changed document
+        with _lock:
+            self._client.counters.doc_reads += len(changes)
+        # Like Firestore, the first snapshot is delivered even when the result set is empty
+        if changes or not self._fired:
+            self._fired = True
+            snaps = [DocumentSnapshot(coll.document(i), d) for i, d in rows.items()]
+            self._callback(snaps, changes, datetime.datetime.now(datetime.timezone.utc))
+
+    def _fire_doc(self, doc_id):
+        """
+        Deliver a write to one document without rescanning the collection, as Firestore sends only
+        what changed. Used for listeners without a limit or cursor; the snapshot list passed to the
+        callback then holds just the changed document.
+        """
+        from google.cloud.firestore_v1.watch import ChangeType
+        with _lock:
+            data = self._client._data.get(self._query._collection, {}).get(doc_id)
+            data = copy.deepcopy(data) if data is not None and self._query._matches(data) else None
+        known = self._known.get(doc_id)
+        if data == known:
+            return
+        coll = CollectionReference(self._client, self._query._collection)
+        if data is None:
+            del self._known[doc_id]
+            change = _Change(ChangeType.REMOVED, DocumentSnapshot(coll.document(doc_id), known))
+        else:
+            self._known[doc_id] = data
+            change = _Change(ChangeType.ADDED if known is None else ChangeType.MODIFIED, DocumentSnapshot(coll.document(doc_id), data))
+        with _lock:
+            self._client.counters.doc_reads += 1
+        self._callback([change.document], [change], datetime.datetime.now(datetime.timezone.utc))
+
+    def unsubscribe(self):
+        self._client._watches.remove(self)
+
+
+class _Change:
+    def __init__(self, type_, document):
+        self.type = type_
+        self.document = document
+
+
+class MemoryFirestore:
+    def __init__(self):
+        self._data = {}
+        self._watches = []
+        self.counters = Counters()
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        with _lock:
+            self.counters.gets += 1
+            snaps = []
+            for ref in references:
+                self.counters.doc_reads += 1
+                snaps.append(DocumentSnapshot(ref, ref._store().get(ref.id), field_paths))
+        return iter(snaps)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return Transaction(self, **kwargs)
+
+    def _listen(self, query, callback):
+        watch = Watch(self, query, callback)
+        self._watches.append(watch)
+        watch._fire()
+        return watch
+
+    def _notify(self, collection, doc_id):
+        for watch in list(self._watches):
+            if watch._query._collection != collection:
+                continue
+            if watch._fired and watch._query._limit is None and watch._query._cursor is None:
+                watch._fire_doc(doc_id)
+            else:
+                watch._fire()
+
+    def seed(self, collection: str, docs: dict):
+        """Load {doc_id: data} without counting writes."""
+        store = self._data.setdefault(collection, {})
+        for doc_id, data in docs.items():
+            store[doc_id] = _resolve_transforms(data)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker driven by the error and slow-call rate of recent calls.
+    Closed: calls go through and their outcomes are kept for `window` seconds; once at least
+    `min_calls` were seen and the share that failed or took longer than `slow_call_seconds`
+    reaches `failure_rate`, the circuit opens. Open: allow() is False until `cooldown` seconds
+    have passed. Half-open: exactly one caller is let through as a probe; its outcome closes
+    the circuit again or reopens it for another cooldown.
+    """
+
+    def __init__(self, window: float = 60, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 10, cooldown: float = 30, clock=time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = None
+        self._probe_in_flight = False
+        # (finished_at, bad) for calls within the window
+        self._calls = deque()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(self._clock())
+            return self._state
+
+    def _advance(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self._calls.clear()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. In half-open only the first caller gets True."""
+        with self._lock:
+            self._advance(self._clock())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, seconds: float):
+        """Report the outcome of a call that allow() let through."""
+        bad = not ok or seconds >= self.slow_call_seconds
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                if bad:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._probe_in_flight = False
+                    self._calls.clear()
+                return
+            if self._state == OPEN:
+                # A call let through before the circuit opened; it no longer counts
+                return
+            self._calls.append((now, bad))
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._calls.popleft()
+            failures = sum(1 for _, b in self._calls if b)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate:
+                self._open(now)
+
+    def release(self):
+        """Give back a half-open probe slot when the allowed call never reached the service."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            self._advance(now)
+            failures = sum(1 for _, b in self._calls if b)
+            return {
+                "state": self._state,
+                "recent_calls": len(self._calls),
+                "recent_failures": failures,
+                "retry_in_s": round(max(0.0, self.cooldown - (now - self._opened_at)), 1) if self._state == OPEN else 0.0,
+            }
@@ -2,27 +2,38 @@ import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, firestore
 
-if not firebase_admin._apps:
-    # Get the private key and fix newlines
-    private_key = st.secrets["firebase"]["private_key"]
-    
-    # THIS IS THE FIX - convert \n to actual newlines
-    private_key = private_key.replace("\\n", "\n")
-    
-    key_dict = {
-        "type": st.secrets["firebase"]["type"],
-        "project_id": st.secrets["firebase"]["project_id"],
-        "private_key_id": st.secrets["firebase"]["private_key_id"],
-        "private_key": private_key,  # Use fixed key
-        "client_email": st.secrets["firebase"]["client_email"],
-        "client_id": st.secrets["firebase"]["client_id"],
-        "auth_uri": st.secrets["firebase"]["auth_uri"],
-        "token_uri": st.secrets["firebase"]["token_uri"],
-        "auth_provider_x509_cert_url": st.secrets["firebase"]["auth_provider_x509_cert_url"],
-        "client_x509_cert_url": st.secrets["firebase"]["client_x509_cert_url"]
-    }
-    
-    cred = credentials.Certificate(key_dict)
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+
+@st.cache_resource(show_spinner=False)
+def get_db():
+    """Firestore client, built once per process and shared by every session."""
+    if not firebase_admin._apps:
+        # Get the private key and fix newlines
+        private_key = st.secrets["firebase"]["private_key"]
+
+        # THIS IS THE FIX - convert \n to actual newlines
+        private_key = private_key.replace("\\n", "\n")
+
+        key_dict = {
+            "type": st.secrets["firebase"]["type"],
+            "project_id": st.secrets["firebase"]["project_id"],
+            "private_key_id": st.secrets["firebase"]["private_key_id"],
+            "private_key": private_key,  # Use fixed key
+            "client_email": st.secrets["firebase"]["client_email"],
+            "client_id": st.secrets["firebase"]["client_id"],
+            "auth_uri": st.secrets["firebase"]["auth_uri"],
+            "token_uri": st.secrets["firebase"]["token_uri"],
+            "auth_provider_x509_cert_url": st.secrets["firebase"]["auth_provider_x509_cert_url"],
+            "client_x509_cert_url": st.secrets["firebase"]["client_x509_cert_url"]
+        }
+
+        cred = credentials.Certificate(key_dict)
+        firebase_admin.initialize_app(cred)
+
+    return firestore.client()
+
+
+def __getattr__(name):
+    # `firebase_config.db` still works; the client is only built on first use
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,610 @@
+import sys
+import threading
+from firebase_admin import firestore
+import search_index
+from live_mirror import CollectionMirror
+from metrics import call_site, instrument, track
+from firebase_config import get_db
+from tiffin_stats import apply_review_change, empty_stats, rescan_price_bounds
+
+USERS = "users"
+USERS_BY_EMAIL = "users_by_email"
+TIFFINS = "tiffins"
+REVIEWS = "reviews"
+STATS = "tiffin_stats"
+SUMMARIES = "tiffin_summaries"
+
+# Process-wide client (a Streamlit cached resource)
+db = get_db()
+
+# Fields needed to rank tiffins and label the Top Rated boxes
+TIFFIN_RANKING_FIELDS = ["name", "food_type", "price_monthly"]
+# Fields shown on the dashboards
+TIFFIN_DASHBOARD_FIELDS = ["name", "food_type", "price_monthly", "price_daily", "price_per_tiffin"]
+
+
+def _get_many(collection: str, ids, fields: list | None = None) -> dict:
+    """Fetch many documents of one collection in a single RPC. Returns {id: data} for those that exist."""
+    refs = [db.collection(collection).document(i) for i in dict.fromkeys(ids) if i]
+    if not refs:
+        return {}
+    out = {}
+    for snap in db.get_all(refs, field_paths=fields):
+        if snap.exists:
+            out[snap.id] = snap.to_dict() or {}
+    return out
+
+
+def _stream(query, fields: list | None = None) -> list:
+    if fields:
+        query = query.select(fields)
+    return [(snap.id, snap.to_dict() or {}) for snap in query.stream()]
+
+
+# ================= LIVE MIRROR =================
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def start_live_mirror(timeout: float = 5.0) -> dict:
+    """
+    Subscribe process-wide mirrors of tiffins, reviews and tiffin_stats (once) and wait up to
+    `timeout` seconds for their first snapshots. While a mirror is ready, the reads below are
+    answered from memory instead of Firestore.
+    """
+    with _mirrors_lock:
+        if not _mirrors:
+            _mirrors[TIFFINS] = CollectionMirror(db.collection(TIFFINS))
+            _mirrors[REVIEWS] = CollectionMirror(db.collection(REVIEWS), index_field="tiffin_id")
+            _mirrors[STATS] = CollectionMirror(db.collection(STATS))
+    for mirror in list(_mirrors.values()):
+        mirror.wait_ready(timeout)
+    return dict(_mirrors)
+
+
+def stop_live_mirror():
+    with _mirrors_lock:
+        for mirror in _mirrors.values():
+            mirror.close()
+        _mirrors.clear()
+
+
+def _mirror(collection: str) -> CollectionMirror | None:
+    mirror = _mirrors.get(collection)
+    return mirror if mirror is not None and mirror.ready else None
+
+
+def _project(data: dict, fields: list | None) -> dict:
+    if not fields:
+        return dict(data)
+    return {f: data[f] for f in fields if f in data}
+
+
+def data_version() -> tuple | None:
+    """
+    Change counters of the mirrored tiffins, reviews and tiffin_stats, for caching anything
+    derived from them; None when the live mirror is not running.
+    """
+    mirrors = [_mirror(col) for col in (TIFFINS, REVIEWS, STATS)]
+    if any(m is None for m in mirrors):
+        return None
+    return tuple((id(m), m.version) for m in mirrors)
+
+
+def _mirror_rows(rows, fields: list | None) -> list:
+    return [(doc_id, _project(data, fields)) for doc_id, data in rows]
+
+
+def _mirror_many(mirror: CollectionMirror, ids, fields: list | None = None) -> dict:
+    out = {}
+    for i in dict.fromkeys(ids):
+        data = mirror.get(i) if i else None
+        if data is not None:
+            out[i] = _project(data, fields)
+    return out
+
+
+# ================= USERS =================
+
+@instrument("firestore", "read")
+def get_user(user_id: str) -> dict:
+    snap = db.collection(USERS).document(user_id).get()
+    return snap.to_dict() if snap.exists else {}
+
+
+@instrument("firestore", "write")
+def update_user(user_id: str, fields: dict):
+    db.collection(USERS).document(user_id).update(fields)
+
+
+def email_key(email: str) -> str:
+    """Document id of an email's users_by_email entry: the trimmed, lowercased address."""
+    return (email or "").strip().lower().replace("/", "%2F")
+
+
+def _login_entry(user_id: str, data: dict) -> dict:
+    # Everything login needs, so it is a single document get
+    return {"user_id": user_id, "password": data.get("password", ""), "role": data.get("role")}
+
+
+@instrument("firestore", "read")
+def get_login(email: str) -> dict | None:
+    """Return {"user_id", "password", "role"} for the account registered with this email, or None."""
+    if not email_key(email):
+        return None
+    snap = db.collection(USERS_BY_EMAIL).document(email_key(email)).get()
+    return snap.to_dict() if snap.exists else None
+
+
+@firestore.transactional
+def _create_user_txn(transaction, data: dict) -> str | None:
+    index_ref = db.collection(USERS_BY_EMAIL).document(email_key(data["email"]))
+    if index_ref.get(transaction=transaction).exists:
+        return None
+    user_ref = db.collection(USERS).document()
+    transaction.create(user_ref, data)
+    transaction.create(index_ref, _login_entry(user_ref.id, data))
+    return user_ref.id
+
+
+@instrument("firestore", "transaction")
+def create_user(data: dict) -> str | None:
+    """
+    Create the user and its users_by_email entry in one transaction.
+    Returns the new user id, or None when the email is already registered.
+    """
+    return _create_user_txn(db.transaction(), data)
+
+
+# ================= TIFFINS =================
+
+@instrument("firestore", "query")
+def list_tiffins(fields: list | None = None) -> list:
+    """Return [(tiffin_id, data)] for the whole catalogue."""
+    mirror = _mirror(TIFFINS)
+    if mirror is not None:
+        return _mirror_rows(mirror.items(), fields)
+    return _stream(db.collection(TIFFINS), fields)
+
+
+def normalize_location(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def location_tokens(location: str, delivery_locations: list) -> list:
+    """
+    Lowercase search tokens for the areas a tiffin delivers to: every full area name plus each of
+    its words, so both "rgpv campus" and "campus" match with array_contains. The kitchen's own
+    location only counts when no delivery areas are listed.
+    """
+    tokens = []
+    for loc in [loc for loc in delivery_locations or [] if normalize_location(loc)] or [location]:
+        norm = normalize_location(loc)
+        if not norm:
+            continue
+        for token in [norm] + norm.split():
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def _with_location_tokens(data: dict, current: dict | None = None) -> dict:
+    if "location" not in data and "delivery_locations" not in data:
+        return data
+    merged = dict(current or {})
+    merged.update(data)
+    data = dict(data)
+    data["location_tokens"] = location_tokens(merged.get("location", ""), merged.get("delivery_locations", []))
+    return data
+
+
+def _order_value(value):
+    # Numbers sort before strings, as in Firestore's cross-type ordering
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    return (1, str(value))
+
+
+def page_orders(max_monthly) -> list:
+    """The order_by fields of list_tiffins_page, which a dict cursor carries along with `__id__`."""
+    return (["price_monthly"] if max_monthly else []) + ["name"]
+
+
+def check_page_cursor(cursor: dict, max_monthly) -> None:
+    """Raise ValueError unless `cursor` has exactly the fields of a page ordered for these filters."""
+    if not isinstance(cursor, dict) or set(cursor) != set(page_orders(max_monthly)) | {"__id__"}:
+        raise ValueError("cursor does not match the page ordering")
+    doc_id = cursor["__id__"]
+    if not isinstance(doc_id, str) or not doc_id or "/" in doc_id:
+        raise ValueError("cursor has an invalid document id")
+
+
+def _page_from_mirror(mirror, page_size, start_after, fields, food_type, max_monthly, location) -> tuple:
+    orders = page_orders(max_monthly)
+    token = normalize_location(location) if location else ""
+    rows = []
+    for tid, d in mirror.items():
+        if food_type and d.get("food_type") != food_type:
+            continue
+        if token and token not in (d.get("location_tokens") or []):
+            continue
+        if max_monthly and not (_order_value(d.get("price_monthly"))[0] == 0 and d["price_monthly"] <= max_monthly):
+            continue
+        # Firestore leaves out documents missing an order_by field
+        if any(o not in d for o in orders):
+            continue
+        rows.append((tid, d))
+
+    def key(doc_id, d):
+        return tuple(_order_value(d[o]) for o in orders) + (doc_id,)
+
+    rows.sort(key=lambda row: key(*row))
+    if start_after is not None:
+        if isinstance(start_after, dict):
+            after = key(start_after["__id__"], start_after)
+        else:
+            after = key(start_after.id, start_after.to_dict() or {})
+        rows = [row for row in rows if key(*row) > after]
+    page = rows[:page_size]
+    cursor = None
+    if len(page) == page_size:
+        last_id, last = page[-1]
+        cursor = {o: last[o] for o in orders}
+        cursor["__id__"] = last_id
+    return _mirror_rows(page, fields), cursor
+
+
+@instrument("firestore", "query")
+def list_tiffins_page(
+    page_size: int,
+    start_after=None,
+    fields: list | None = None,
+    food_type: str | None = None,
+    max_monthly: float | None = None,
+    location: str | None = None,
+) -> tuple:
+    """
+    Return ([(tiffin_id, data)], cursor) for one page of tiffins matching the filters.
+    Food type, monthly price and location are evaluated by Firestore (see firestore.indexes.json),
+    so reads scale with the matches rather than the catalogue. Pages are ordered by name, or by
+    monthly price when a price bound is set. Pass the cursor back as `start_after` for the next
+    page; it is None once the results are exhausted. Served from the live mirror when it is ready.
+    """
+    if isinstance(start_after, dict):
+        check_page_cursor(start_after, max_monthly)
+    mirror = _mirror(TIFFINS)
+    if mirror is not None:
+        return _page_from_mirror(mirror, page_size, start_after, fields, food_type, max_monthly, location)
+
+    query = db.collection(TIFFINS)
+    if food_type:
+        query = query.where("food_type", "==", food_type)
+    if location and normalize_location(location):
+        query = query.where("location_tokens", "array_contains", normalize_location(location))
+    if max_monthly:
+        # Firestore requires the first order_by to be on the inequality field
+        query = query.where("price_monthly", "<=", max_monthly).order_by("price_monthly")
+    # Explicit document-id order, so a plain-dict cursor can carry the tie-break between equal names
+    query = query.order_by("name").order_by("__name__").limit(page_size)
+    if isinstance(start_after, dict):
+        # A cursor handed out by the mirror or the API: resume from its order_by values and id
+        cursor = {k: v for k, v in start_after.items() if k != "__id__"}
+        cursor["__name__"] = db.collection(TIFFINS).document(start_after["__id__"])
+        query = query.start_after(cursor)
+    elif start_after is not None:
+        query = query.start_after(start_after)
+    if fields:
+        query = query.select(fields)
+    snaps = list(query.stream())
+    rows = [(snap.id, snap.to_dict() or {}) for snap in snaps]
+    cursor = snaps[-1] if len(snaps) == page_size else None
+    return rows, cursor
+
+
+@instrument("firestore", "query")
+def list_provider_tiffins(provider_id: str, fields: list | None = None) -> list:
+    mirror = _mirror(TIFFINS)
+    if mirror is not None:
+        return _mirror_rows([(t, d) for t, d in mirror.items() if d.get("provider_id") == provider_id], fields)
+    return _stream(db.collection(TIFFINS).where("provider_id", "==", provider_id), fields)
+
+
+@instrument("firestore", "read")
+def get_tiffins(ids, fields: list | None = None) -> dict:
+    mirror = _mirror(TIFFINS)
+    if mirror is not None:
+        return _mirror_many(mirror, ids, fields)
+    return _get_many(TIFFINS, ids, fields)
+
+
+def _mirror_write(collection: str, doc_id: str, data: dict | None, merge: bool = False):
+    """Apply this process's own write to the mirror now, so the same rerun already sees it."""
+    mirror = _mirror(collection)
+    if mirror is None:
+        return
+    if data is None:
+        mirror.remove(doc_id)
+    elif merge:
+        mirror.merge(doc_id, data)
+    else:
+        mirror.put(doc_id, data)
+
+
+@instrument("firestore", "write")
+def add_tiffin(data: dict) -> str:
+    data = _with_location_tokens(data)
+    _, ref = db.collection(TIFFINS).add(data)
+    _mirror_write(TIFFINS, ref.id, data)
+    search_index.on_tiffin_written(ref.id, data)
+    return ref.id
+
+
+@instrument("firestore", "write")
+def update_tiffin(tiffin_id: str, fields: dict):
+    """Update a tiffin; location_tokens are recomputed when the location or delivery areas change."""
+    current = None
+    if ("location" in fields) != ("delivery_locations" in fields):
+        current = get_tiffins([tiffin_id], ["location", "delivery_locations"]).get(tiffin_id)
+    fields = _with_location_tokens(fields, current)
+    db.collection(TIFFINS).document(tiffin_id).update(fields)
+    _mirror_write(TIFFINS, tiffin_id, fields, merge=True)
+    search_index.on_tiffin_written(tiffin_id, fields)
+
+
+@instrument("firestore", "write")
+def delete_tiffin(tiffin_id: str):
+    """Delete a tiffin together with its aggregate and stored summary."""
+    batch = db.batch()
+    batch.delete(db.collection(TIFFINS).document(tiffin_id))
+    batch.delete(db.collection(STATS).document(tiffin_id))
+    batch.delete(db.collection(SUMMARIES).document(tiffin_id))
+    batch.commit()
+    _mirror_write(TIFFINS, tiffin_id, None)
+    _mirror_write(STATS, tiffin_id, None)
+    search_index.on_tiffin_written(tiffin_id, None)
+
+
+# ================= REVIEWS =================
+
+@instrument("firestore", "query")
+def list_reviews(tiffin_id: str, fields: list | None = None) -> list:
+    """Return the review dicts of one tiffin."""
+    mirror = _mirror(REVIEWS)
+    if mirror is not None:
+        return [d for _, d in _mirror_rows(mirror.items_where(tiffin_id), fields)]
+    return [d for _, d in _stream(db.collection(REVIEWS).where("tiffin_id", "==", tiffin_id), fields)]
+
+
+def iter_review_texts(tiffin_id: str):
+    """
+    Yield one tiffin's review texts without holding them all, for summaries over many reviews.
+    Recorded in metrics as one call spanning the whole iteration.
+    """
+    site = call_site()
+
+    def texts():
+        with track("firestore", "iter_review_texts", "query", site):
+            mirror = _mirror(REVIEWS)
+            if mirror is not None:
+                rows = (data for _, data in mirror.items_where(tiffin_id))
+            else:
+                query = db.collection(REVIEWS).where("tiffin_id", "==", tiffin_id).select(["review"])
+                rows = (snap.to_dict() or {} for snap in query.stream())
+            for d in rows:
+                if d.get("review"):
+                    yield str(d["review"])
+
+    return texts()
+
+
+@firestore.transactional
+def _save_review_txn(transaction, tiffin_id: str, user_id: str, payload: dict) -> tuple:
+    reviews = db.collection(REVIEWS)
+    existing = None
+    for snap in transaction.get(reviews.where("tiffin_id", "==", tiffin_id).where("user_id", "==", user_id).limit(1)):
+        existing = snap
+        break
+
+    stats_ref = db.collection(STATS).document(tiffin_id)
+    stats_snap = stats_ref.get(transaction=transaction)
+    stats = stats_snap.to_dict() if stats_snap.exists else empty_stats(tiffin_id)
+
+    old = existing.to_dict() if existing else None
+    if apply_review_change(stats, old, payload):
+        others = [
+            s.to_dict() for s in transaction.get(reviews.where("tiffin_id", "==", tiffin_id).select(["price"]))
+            if not existing or s.id != existing.id
+        ]
+        rescan_price_bounds(stats, others + [payload])
+
+    stats["updated_at"] = firestore.SERVER_TIMESTAMP
+    review_ref = existing.reference if existing else reviews.document()
+    if existing:
+        transaction.update(review_ref, payload)
+    else:
+        transaction.set(review_ref, payload)
+    transaction.set(stats_ref, stats)
+    return review_ref.id, existing is not None, stats
+
+
+@instrument("firestore", "transaction")
+def save_review(tiffin_id: str, user_id: str, payload: dict) -> tuple:
+    """
+    Create or update the user's review and its tiffin_stats in one transaction.
+    Returns (True if an earlier review was updated, the new tiffin_stats). The stats leave out
+    updated_at, which only the server knows, so they are for display rather than fingerprints.
+    """
+    review_id, updated, stats = _save_review_txn(db.transaction(), tiffin_id, user_id, payload)
+    # tiffin_stats holds a server timestamp, so the mirror takes it from the listener instead
+    _mirror_write(REVIEWS, review_id, payload, merge=updated)
+    stats = {k: v for k, v in stats.items() if k != "updated_at"}
+    return updated, stats
+
+
+@firestore.transactional
+def _delete_review_txn(transaction, review_id: str):
+    review_ref = db.collection(REVIEWS).document(review_id)
+    review_snap = review_ref.get(transaction=transaction)
+    if not review_snap.exists:
+        return
+    old = review_snap.to_dict() or {}
+    tiffin_id = old.get("tiffin_id")
+    stats_ref = db.collection(STATS).document(tiffin_id)
+    stats_snap = stats_ref.get(transaction=transaction)
+    stats = stats_snap.to_dict() if stats_snap.exists else empty_stats(tiffin_id)
+
+    if apply_review_change(stats, old, None):
+        others = [
+            s.to_dict() for s in transaction.get(db.collection(REVIEWS).where("tiffin_id", "==", tiffin_id).select(["price"]))
+            if s.id != review_id
+        ]
+        rescan_price_bounds(stats, others)
+
+    transaction.delete(review_ref)
+    if stats["count"] > 0:
+        stats["updated_at"] = firestore.SERVER_TIMESTAMP
+        transaction.set(stats_ref, stats)
+    else:
+        transaction.delete(stats_ref)
+
+
+@instrument("firestore", "transaction")
+def delete_review(review_id: str):
+    """Delete a review and remove it from its tiffin_stats in one transaction."""
+    _delete_review_txn(db.transaction(), review_id)
+    _mirror_write(REVIEWS, review_id, None)
+
+
+# ================= TIFFIN STATS =================
+
+@instrument("firestore", "read")
+def get_stats(tiffin_id: str) -> dict | None:
+    mirror = _mirror(STATS)
+    if mirror is not None:
+        data = mirror.get(tiffin_id)
+        return dict(data) if data is not None else None
+    snap = db.collection(STATS).document(tiffin_id).get()
+    return snap.to_dict() if snap.exists else None
+
+
+@instrument("firestore", "read")
+def get_stats_many(ids) -> dict:
+    mirror = _mirror(STATS)
+    if mirror is not None:
+        return _mirror_many(mirror, ids)
+    return _get_many(STATS, ids)
+
+
+@instrument("firestore", "query")
+def get_all_stats() -> dict:
+    """Return {tiffin_id: stats} for every tiffin that has at least one review."""
+    mirror = _mirror(STATS)
+    rows = _mirror_rows(mirror.items(), None) if mirror is not None else _stream(db.collection(STATS))
+    return {tid: d for tid, d in rows if d.get("count")}
+
+
+@instrument("firestore", "batch")
+def rebuild_all_stats() -> int:
+    """Recompute every tiffin_stats document from the reviews collection. Returns the number written."""
+    rebuilt = {}
+    for _, d in _stream(db.collection(REVIEWS), ["tiffin_id", "rating", "ai_score", "price"]):
+        tid = d.get("tiffin_id")
+        if not tid:
+            continue
+        stats = rebuilt.setdefault(tid, empty_stats(tid))
+        apply_review_change(stats, None, d)
+
+    writes = []
+    for tid, _ in _stream(db.collection(STATS), ["count"]):
+        if tid not in rebuilt:
+            writes.append((db.collection(STATS).document(tid), None))
+    for tid, stats in rebuilt.items():
+        stats["updated_at"] = firestore.SERVER_TIMESTAMP
+        writes.append((db.collection(STATS).document(tid), stats))
+
+    # Firestore caps a batch at 500 writes
+    for start in range(0, len(writes), 450):
+        batch = db.batch()
+        for ref, stats in writes[start:start + 450]:
+            if stats is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, stats)
+        batch.commit()
+    return len(rebuilt)
+
+
+# ================= SUMMARIES =================
+
+@instrument("firestore", "read")
+def get_summaries(ids) -> dict:
+    return _get_many(SUMMARIES, ids)
+
+
+@instrument("firestore", "write")
+def set_summary(tiffin_id: str, summary: dict):
+    data = dict(summary)
+    data["updated_at"] = firestore.SERVER_TIMESTAMP
+    db.collection(SUMMARIES).document(tiffin_id).set(data)
+
+
+@instrument("firestore", "batch")
+def backfill_email_index() -> tuple:
+    """
+    Create users_by_email entries for accounts registered before the index existed.
+    Emails that several accounts share once lowercased get no entry, since picking one would lock
+    the others out; they have to be merged or renamed by hand.
+    Returns (emails indexed, {email key: [user ids]} of those collisions).
+    """
+    accounts = {}
+    for uid, d in _stream(db.collection(USERS), ["email", "password", "role"]):
+        key = email_key(d.get("email", ""))
+        if key:
+            accounts.setdefault(key, []).append((uid, d))
+    collisions = {key: sorted(uid for uid, _ in rows) for key, rows in accounts.items() if len(rows) > 1}
+    items = [(key, _login_entry(*rows[0])) for key, rows in accounts.items() if len(rows) == 1]
+    for start in range(0, len(items), 450):
+        batch = db.batch()
+        for key, entry in items[start:start + 450]:
+            batch.set(db.collection(USERS_BY_EMAIL).document(key), entry)
+        batch.commit()
+    return len(items), collisions
+
+
+@instrument("firestore", "batch")
+def backfill_location_tokens() -> int:
+    """Add location_tokens to tiffins written before location search was pushed into Firestore."""
+    rows = list_tiffins(["location", "delivery_locations"])
+    for start in range(0, len(rows), 450):
+        batch = db.batch()
+        for tid, d in rows[start:start + 450]:
+            batch.update(
+                db.collection(TIFFINS).document(tid),
+                {"location_tokens": location_tokens(d.get("location", ""), d.get("delivery_locations", []))},
+            )
+        batch.commit()
+    return len(rows)
+
+
+def _backfill_email_index_command():
+    indexed, collisions = backfill_email_index()
+    print(f"Indexed {indexed} emails")
+    for key, user_ids in sorted(collisions.items()):
+        print(f"not indexed, shared by {len(user_ids)} accounts: {key} ({', '.join(user_ids)})", file=sys.stderr)
+    if collisions:
+        sys.exit(1)
+
+
+COMMANDS = {
+    "backfill-stats": lambda: print(f"Rebuilt stats for {rebuild_all_stats()} tiffins"),
+    "backfill-location-tokens": lambda: print(f"Tokenized locations of {backfill_location_tokens()} tiffins"),
+    "backfill-email-index": _backfill_email_index_command,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(f"usage: python firestore_db.py {{{'|'.join(COMMANDS)}}}")
+        sys.exit(2)
+    COMMANDS[sys.argv[1]]()
@@ -1,90 +1,316 @@
+import itertools
+import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError, field_validator
+from typing_extensions import TypedDict
+import metrics
+from circuit_breaker import CircuitBreaker
+from response_cache import get_response_cache
 
 load_dotenv()
 
+# Seconds one generate_content request may take before the SDK gives up on it
+GEMINI_REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT", 30))
 
-def try_gemini(prompt: str):
-    """Try Gemini safely (no hardcoding)."""
-    try:
+
+class ModelRegistry:
+    """
+    Process-wide Gemini client. Configures the SDK once, resolves and health-checks a usable
+    model in a background thread, and hands the same GenerativeModel to every caller until
+    Gemini stops serving it or `refresh_interval` seconds have passed.
+    """
+
+    def __init__(self, refresh_interval: float = 6 * 3600, retry_interval: float = 60):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._configured = False
+        self._model_name = None
+        self._model = None
+        # Last successful resolution, and last attempt whether or not it found a model
+        self._resolved_at = None
+        self._attempted_at = None
+        self._resolving = False
+
+    def _resolve(self):
         import google.generativeai as genai
 
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        if not self._configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            self._configured = True
 
-        # Dynamically find a usable model
-        for m in genai.list_models():
-            if "generateContent" in m.supported_generation_methods:
-                model = genai.GenerativeModel(m.name)
-                response = model.generate_content(prompt)
-                return response.text.strip()
+        preferred = os.getenv("GEMINI_MODEL")
+        candidates = [preferred] if preferred else []
+        # Dynamically find usable models
+        for m in genai.list_models(request_options={"timeout": GEMINI_REQUEST_TIMEOUT}):
+            if "generateContent" in m.supported_generation_methods and m.name not in candidates:
+                candidates.append(m.name)
 
-        return None
-    except Exception:
-        return None
+        # Health-check only the first few candidates so an outage does not cost dozens of calls
+        for name in candidates[:3]:
+            model = genai.GenerativeModel(name)
+            try:
+                model.generate_content(
+                    "Reply with OK.",
+                    generation_config={"max_output_tokens": 5},
+                    request_options={"timeout": GEMINI_REQUEST_TIMEOUT},
+                )
+            except Exception:
+                continue
+            return name, model
+        return None, None
+
+    def _due(self, now: float) -> bool:
+        if self._resolving or self._model is None:
+            return False
+        # After a failed refresh wait `retry_interval` before hitting list_models() again
+        if now - self._attempted_at < self.retry_interval:
+            return False
+        return now - self._resolved_at >= self.refresh_interval
+
+    def get(self):
+        """
+        Return (model_name, model) without waiting. When the current model is due for refresh a
+        new one is resolved in the background, and the current one is served until the
+        replacement has passed its health check. Without a model this returns (None, None);
+        try_gemini then starts a resolution as a call the circuit breaker has let through.
+        """
+        with self._lock:
+            name, model = self._model_name, self._model
+            due = self._due(time.monotonic())
+        if due:
+            self.refresh()
+        return name, model
+
+    def refresh(self, on_done=None):
+        """
+        Resolve a model in a background thread unless one is already being resolved, and call
+        `on_done(ok, seconds)` when it finishes. A failed resolution keeps the current model.
+        Returns the thread, or None if a resolution was already running.
+        """
+        with self._lock:
+            if self._resolving:
+                return None
+            self._resolving = True
+            self._attempted_at = time.monotonic()
+        thread = threading.Thread(target=self._refresh, args=(on_done,), name="gemini-resolve", daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh(self, on_done):
+        start = time.monotonic()
+        name, model = None, None
+        try:
+            name, model = self._resolve()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                if model is not None:
+                    self._model_name, self._model = name, model
+                    self._resolved_at = time.monotonic()
+                self._resolving = False
+        if on_done is not None:
+            on_done(model is not None, time.monotonic() - start)
 
+    def invalidate(self):
+        """Drop a model Gemini no longer serves (retired, or not allowed for this key)."""
+        with self._lock:
+            self._model_name = None
+            self._model = None
 
-def fallback_ai(review_text: str, price: float | None = None):
-    """Fallback sentiment analysis using keyword matching."""
-    text = review_text.lower()
 
-    strong_positive = [
-        "very tasty", "excellent", "awesome", "amazing", "delicious",
-        "homemade", "fresh", "healthy", "perfect", "best", "love it",
-        "superb", "mouth watering"
-    ]
+_registry = ModelRegistry(float(os.getenv("GEMINI_MODEL_REFRESH_SECONDS", 6 * 3600)))
+
+
+def get_model_registry() -> ModelRegistry:
+    return _registry
+
+
+# Shared by every caller: once Gemini keeps failing or answering slowly, prompts return None at
+# once (so each function uses its rule-based fallback) until a single probe call succeeds again
+_breaker = CircuitBreaker(
+    window=float(os.getenv("GEMINI_BREAKER_WINDOW", 60)),
+    min_calls=int(os.getenv("GEMINI_BREAKER_MIN_CALLS", 5)),
+    failure_rate=float(os.getenv("GEMINI_BREAKER_FAILURE_RATE", 0.5)),
+    slow_call_seconds=float(os.getenv("GEMINI_SLOW_CALL_SECONDS", 10)),
+    cooldown=float(os.getenv("GEMINI_BREAKER_COOLDOWN", 30)),
+)
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    return _breaker
+
 
-    mild_positive = [
-        "good", "nice", "okay", "decent", "fine", "satisfactory",
-        "soft roti", "good taste", "less oil", "balanced spice",
-        "clean", "hygienic", "good quantity", "value for money"
-    ]
+def warm_up_gemini():
+    """Resolve the model in the background so the first prompt does not pay for it."""
+    if _registry._attempted_at is None:
+        _registry.refresh()
 
-    strong_negative = [
-        "worst", "very bad", "pathetic", "disgusting", "spoiled",
-        "smelly", "stale", "raw", "uncooked", "food poisoning"
-    ]
 
-    mild_negative = [
-        "bad", "average", "oily", "too spicy", "bland", "cold food",
-        "late", "delayed", "small quantity", "overpriced",
-        "not fresh", "sometimes late", "inconsistent"
-    ]
+# Cached answers are keyed on the configured model rather than the resolved one, so they are
+# served even while no model is resolved or the circuit breaker is open
+RESPONSE_CACHE_NAMESPACE = os.getenv("GEMINI_MODEL") or "auto"
 
-    score = 5
 
-    for w in strong_positive:
-        if w in text:
-            score += 2
+def _api_errors() -> tuple:
+    """Errors that mean Gemini itself failed (API error, timeout, network), not the request we built."""
+    from google.api_core.exceptions import GoogleAPIError
 
-    for w in mild_positive:
-        if w in text:
-            score += 1
+    return GoogleAPIError, OSError
 
-    for w in strong_negative:
-        if w in text:
-            score -= 2
 
-    for w in mild_negative:
-        if w in text:
-            score -= 1
+def _model_errors() -> tuple:
+    """API errors that mean the model itself is unusable, so another one has to be resolved."""
+    from google.api_core.exceptions import NotFound, PermissionDenied
 
-    if price is not None:
+    return NotFound, PermissionDenied
+
+
+def try_gemini(prompt: str, response_schema=None, site: str | None = None):
+    """
+    Try Gemini safely (no hardcoding). Identical prompts are answered from the response cache,
+    even during an outage; other prompts return None straight away while the circuit breaker is open.
+    With a `response_schema` (a TypedDict, as the SDK accepts) the model is asked for JSON
+    matching it (structured output).
+    Every call is recorded in metrics under the function that asked (or `site`), with its outcome.
+    """
+    with metrics.track("gemini", "generate_content", "prompt", site or metrics.call_site()) as call:
+        # Structured and free-text answers to the same prompt must not share a cache entry
+        cache_key = prompt if response_schema is None else f"{prompt}\n[schema:{response_schema.__name__}]"
         try:
-            p = float(price)
-            if p >= 3500:
-                score -= 2
-            elif p >= 2500:
-                score -= 1
-            elif p <= 2000:
-                score += 1
+            cache = get_response_cache()
+            cached = cache.get(cache_key, RESPONSE_CACHE_NAMESPACE) if cache is not None else None
         except Exception:
-            pass
+            cache, cached = None, None
+        if cached is not None:
+            call.outcome = "cached"
+            return cached
+
+        if not _breaker.allow():
+            call.outcome = "circuit_open"
+            return None
+        reported = False
+        try:
+            _, model = _registry.get()
+            if model is None:
+                # This allowed call (the half-open probe, when there is one) resolves a model in
+                # the background, and the resolution's outcome is what the breaker records
+                if _registry.refresh(on_done=_breaker.record) is not None:
+                    reported = True
+                call.outcome = "unavailable"
+                return None
+
+            kwargs = {"request_options": {"timeout": GEMINI_REQUEST_TIMEOUT}}
+            if response_schema is not None:
+                kwargs["generation_config"] = {
+                    "response_mime_type": "application/json",
+                    "response_schema": response_schema,
+                }
+            start = time.monotonic()
+            try:
+                response = model.generate_content(prompt, **kwargs)
+            except _api_errors() as exc:
+                _breaker.record(False, time.monotonic() - start)
+                reported = True
+                if isinstance(exc, _model_errors()):
+                    _registry.invalidate()
+                call.outcome = "error"
+                return None
+            _breaker.record(True, time.monotonic() - start)
+            reported = True
+            text = response.text.strip()
+            if cache is not None and text:
+                try:
+                    cache.set(cache_key, RESPONSE_CACHE_NAMESPACE, text)
+                except Exception:
+                    # A busy or broken cache must not throw away an answer we already have
+                    pass
+            return text
+        except Exception:
+            call.outcome = "error"
+            return None
+        finally:
+            if not reported:
+                # A request the SDK rejected before sending, or a resolution already under way,
+                # says nothing about Gemini's health
+                _breaker.release()
+
+
+# Bounded pool shared by every session so concurrent prompts cannot pile up without limit
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+
+
+STRONG_POSITIVE = [
+    "very tasty", "excellent", "awesome", "amazing", "delicious",
+    "homemade", "fresh", "healthy", "perfect", "best", "love it",
+    "superb", "mouth watering"
+]
+
+MILD_POSITIVE = [
+    "good", "nice", "okay", "decent", "fine", "satisfactory",
+    "soft roti", "good taste", "less oil", "balanced spice",
+    "clean", "hygienic", "good quantity", "value for money"
+]
+
+STRONG_NEGATIVE = [
+    "worst", "very bad", "pathetic", "disgusting", "spoiled",
+    "smelly", "stale", "raw", "uncooked", "food poisoning"
+]
+
+MILD_NEGATIVE = [
+    "bad", "average", "oily", "too spicy", "bland", "cold food",
+    "late", "delayed", "small quantity", "overpriced",
+    "not fresh", "sometimes late", "inconsistent"
+]
+
+# Score contribution of each phrase, built once at import; a phrase counts once however often it appears
+_SENTIMENT_WEIGHTS = {
+    phrase: weight
+    for phrases, weight in ((STRONG_POSITIVE, 2), (MILD_POSITIVE, 1), (STRONG_NEGATIVE, -2), (MILD_NEGATIVE, -1))
+    for phrase in phrases
+}
+_SENTIMENT_PHRASES = tuple(_SENTIMENT_WEIGHTS)
+
+
+def _price_adjustment(price) -> int:
+    if price is None:
+        return 0
+    try:
+        p = float(price)
+        if p >= 3500:
+            return -2
+        elif p >= 2500:
+            return -1
+        elif p <= 2000:
+            return 1
+    except Exception:
+        pass
+    return 0
 
-    score = max(0, min(score, 10))
 
+def fallback_ai(review_text: str, price: float | None = None):
+    """Fallback sentiment analysis using keyword matching."""
+    text = review_text.lower()
+    score = 5 + sum([_SENTIMENT_WEIGHTS[p] for p in _SENTIMENT_PHRASES if p in text]) + _price_adjustment(price)
+    score = max(0, min(score, 10))
     return score, "Rule-based review sentiment analysis (fallback)"
 
 
+def fallback_ai_batch(reviews: list) -> list:
+    """
+    fallback_ai for many reviews at once, e.g. everything a batch Gemini call left unanswered.
+    `reviews` is a list of dicts with "review" and optional "price" keys, as for analyze_reviews_batch.
+    """
+    return [fallback_ai(str(r.get("review") or ""), r.get("price")) for r in reviews]
+
+
 def analyze_review(review_text: str, price: float | None = None):
     """Analyze a review and return score and summary."""
     if not review_text.strip():
@@ -133,6 +359,105 @@ Price: {price if price is not None else 'N/A'}
     return fallback_ai(review_text, price)
 
 
+def _estimate_tokens(text: str) -> int:
+    # Rough heuristic: ~4 characters per token for English review text
+    return len(text) // 4 + 1
+
+
+def _parse_json_output(text: str):
+    """Parse a JSON value from model output, tolerating ```json fences and surrounding prose."""
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.strip("`")
+        if cleaned.lower().startswith("json"):
+            cleaned = cleaned[4:]
+    try:
+        return json.loads(cleaned)
+    except Exception:
+        pass
+    for open_ch, close_ch in (("[", "]"), ("{", "}")):
+        start, end = cleaned.find(open_ch), cleaned.rfind(close_ch)
+        if start != -1 and end > start:
+            try:
+                return json.loads(cleaned[start:end + 1])
+            except Exception:
+                continue
+    return None
+
+
+def _iter_chunks_by_tokens(items, size_of, token_budget: int, max_items: int):
+    """Yield consecutive chunks of an iterable whose estimated size stays within token_budget."""
+    current = []
+    used = 0
+    for item in items:
+        cost = size_of(item)
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            yield current
+            current = []
+            used = 0
+        current.append(item)
+        used += cost
+    if current:
+        yield current
+
+
+def _chunk_by_tokens(items: list, size_of, token_budget: int, max_items: int) -> list:
+    """Split items into consecutive chunks whose estimated size stays within token_budget."""
+    return list(_iter_chunks_by_tokens(items, size_of, token_budget, max_items))
+
+
+def analyze_reviews_batch(reviews: list, token_budget: int = 6000, max_per_call: int = 40) -> list:
+    """
+    Analyze many reviews with as few Gemini calls as possible.
+    `reviews` is a list of dicts with "review" and optional "price" keys (the shape stored in Firestore).
+    Returns a list of (score, summary) tuples in the same order. Entries the model does not
+    answer for are scored with fallback_ai.
+    """
+    results = [None] * len(reviews)
+    pending = []
+    for i, r in enumerate(reviews):
+        text = str(r.get("review") or "")
+        if not text.strip():
+            results[i] = (0, "No review provided")
+        else:
+            pending.append((i, text, r.get("price")))
+
+    for chunk in _chunk_by_tokens(pending, lambda p: _estimate_tokens(p[1]) + 20, token_budget, max_per_call):
+        items = [
+            {"id": i, "review": text, "price": price if price is not None else "N/A"}
+            for i, text, price in chunk
+        ]
+        prompt = f"""
+Analyze each of these food reviews together with the price of the meal.
+
+Return ONLY a JSON array with one object per review, in any order:
+[{{"id": <id from input>, "score": <number out of 10>, "summary": "<one line summary>"}}]
+
+Reviews:
+{json.dumps(items, ensure_ascii=False)}
+"""
+        parsed = _parse_json_output(try_gemini(prompt) or "")
+        if isinstance(parsed, list):
+            wanted = {i for i, _, _ in chunk}
+            for entry in parsed:
+                if not isinstance(entry, dict):
+                    continue
+                try:
+                    idx = int(entry.get("id"))
+                    score = max(0.0, min(float(entry.get("score")), 10.0))
+                except Exception:
+                    continue
+                if idx in wanted and results[idx] is None:
+                    summary = str(entry.get("summary") or "").strip() or "AI analysis completed"
+                    results[idx] = (round(score), summary)
+
+    missed = [(i, {"review": text, "price": price}) for i, text, price in pending if results[i] is None]
+    for (i, _), result in zip(missed, fallback_ai_batch([r for _, r in missed])):
+        results[i] = result
+
+    return results
+
+
 def generate_one_line_reason(context: str) -> str:
     """Return a concise one-line reason."""
     if not context or not context.strip():
@@ -156,30 +481,18 @@ Context:
     return (txt[:217] + "...") if len(txt) > 220 else txt
 
 
-def generate_short_summary(context: str, min_words: int = 5, max_words: int = 7) -> str:
-    """Generate a very short summary."""
+def generate_short_summary(context: str, max_words: int = 7) -> str:
+    """
+    Generate a very short summary (read from the combined summarize_reviews result, whose prompt
+    asks for SUMMARY_MIN_WORDS to SUMMARY_MAX_WORDS words; a smaller `max_words` clips it).
+    """
     if not context or not context.strip():
         return "No reviews yet."
 
-    prompt = f"""
-Given the following user reviews, produce a concise summary phrase of {min_words} to {max_words} words capturing the main taste/quality points. Output only the phrase (no extra explanation).
-
-Reviews:
-{context}
-"""
-
-    out = try_gemini(prompt)
-    if out:
-        for line in out.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            words = line.split()
-            if len(words) <= max_words and len(words) >= min_words:
-                return line
-            if len(words) > max_words:
-                return " ".join(words[:max_words])
-            return line
+    result = summarize_reviews([context])
+    summary = _clip_words(result["short_summary"] if result else "", max_words)
+    if summary:
+        return summary
 
     raw_words = context.replace("\n", " ").split()
     if not raw_words:
@@ -192,167 +505,426 @@ def generate_pros_cons_simple(context: str, max_pros: int = 5, max_cons: int = 5
     Generate simple pros and cons lists from reviews.
     Returns: (pros_list, cons_list, improvement_suggestion)
     """
-    if not context or not context.strip():
+    result = summarize_reviews([context], max_pros, max_cons) if context else None
+    if result is None:
         return (
             ["No reviews available yet."],
             ["No reviews available yet."],
             "Collect more student reviews to get actionable insights."
         )
-
-    prompt = f"""
-Analyze these student reviews about a tiffin service and extract:
-
-1. PROS: List {max_pros} positive points students mentioned (things they liked)
-2. CONS: List {max_cons} negative points or complaints students mentioned
-3. SUGGESTION: One short actionable suggestion for improvement (1-2 sentences)
-
-Format your response EXACTLY like this:
-PROS:
-- [positive point 1]
-- [positive point 2]
-...
-
-CONS:
-- [negative point 1]
-- [negative point 2]
-...
-
-SUGGESTION:
-[Your improvement suggestion here]
-
-Reviews:
-{context[:1500]}
-"""
-
-    out = try_gemini(prompt)
-    
-    pros = []
-    cons = []
-    suggestion = "Focus on maintaining food quality and timely delivery based on student feedback."
-    
-    if out:
-        current_section = None
-        suggestion_lines = []
-        
-        for line in out.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            
-            low = line.lower()
-            
-            if low.startswith("pros"):
-                current_section = "pros"
-                continue
-            elif low.startswith("cons"):
-                current_section = "cons"
-                continue
-            elif low.startswith("suggestion"):
-                current_section = "suggestion"
-                # Check if suggestion is on the same line
-                if ":" in line:
-                    rest = line.split(":", 1)[1].strip()
-                    if rest:
-                        suggestion_lines.append(rest)
-                continue
-            
-            # Process items
-            item = line.lstrip("-•*123456789.) ").strip()
-            if not item:
-                continue
-            
-            if current_section == "pros" and len(pros) < max_pros:
-                pros.append(item)
-            elif current_section == "cons" and len(cons) < max_cons:
-                cons.append(item)
-            elif current_section == "suggestion":
-                suggestion_lines.append(item)
-        
-        if suggestion_lines:
-            suggestion = " ".join(suggestion_lines)[:300]
-    
-    # Fallback extraction if AI didn't return proper format
-    if not pros or not cons:
-        pros, cons, suggestion = fallback_pros_cons(context, max_pros, max_cons)
-    
-    # Ensure at least one item in each list
-    if not pros:
-        pros = ["Students generally find the food acceptable."]
-    if not cons:
-        cons = ["No major complaints reported yet."]
-    
-    return pros, cons, suggestion
+    return result["pros"], result["cons"], result["suggestion"]
+
+
+POSITIVE_KEYWORDS = {
+    "tasty": "Food is tasty and flavorful",
+    "delicious": "Delicious meals appreciated by students",
+    "fresh": "Fresh ingredients used",
+    "homemade": "Homemade taste that students love",
+    "good quality": "Good quality food",
+    "clean": "Clean and hygienic preparation",
+    "on time": "Timely delivery",
+    "generous portion": "Generous portion sizes",
+    "value for money": "Good value for money",
+    "soft roti": "Soft and fresh rotis",
+    "variety": "Good variety in menu",
+    "healthy": "Healthy food options",
+    "affordable": "Affordable pricing",
+    "hot food": "Food served hot",
+    "good taste": "Good taste overall"
+}
+
+NEGATIVE_KEYWORDS = {
+    "late": "Sometimes late delivery",
+    "cold": "Food sometimes arrives cold",
+    "oily": "Food can be oily",
+    "spicy": "Sometimes too spicy",
+    "bland": "Food can be bland at times",
+    "small portion": "Portion sizes could be bigger",
+    "expensive": "Pricing could be better",
+    "inconsistent": "Inconsistent quality",
+    "stale": "Freshness could improve",
+    "delay": "Delivery delays reported",
+    "less quantity": "Quantity could be more",
+    "not fresh": "Freshness concerns",
+    "overpriced": "Feels overpriced to some",
+    "packaging": "Packaging needs improvement",
+    "average": "Average quality"
+}
+
+NEGATIONS = ("not ", "no ", "don't", "doesn't", "wasn't", "isn't")
+# A positive keyword is ignored when a negation appears in the characters just before it
+NEGATION_WINDOW = 20
 
 
 def fallback_pros_cons(context: str, max_pros: int = 5, max_cons: int = 5) -> tuple:
     """Fallback keyword-based extraction for pros and cons."""
     text = context.lower()
-    
-    positive_keywords = {
-        "tasty": "Food is tasty and flavorful",
-        "delicious": "Delicious meals appreciated by students",
-        "fresh": "Fresh ingredients used",
-        "homemade": "Homemade taste that students love",
-        "good quality": "Good quality food",
-        "clean": "Clean and hygienic preparation",
-        "on time": "Timely delivery",
-        "generous portion": "Generous portion sizes",
-        "value for money": "Good value for money",
-        "soft roti": "Soft and fresh rotis",
-        "variety": "Good variety in menu",
-        "healthy": "Healthy food options",
-        "affordable": "Affordable pricing",
-        "hot food": "Food served hot",
-        "good taste": "Good taste overall"
-    }
-    
-    negative_keywords = {
-        "late": "Sometimes late delivery",
-        "cold": "Food sometimes arrives cold",
-        "oily": "Food can be oily",
-        "spicy": "Sometimes too spicy",
-        "bland": "Food can be bland at times",
-        "small portion": "Portion sizes could be bigger",
-        "expensive": "Pricing could be better",
-        "inconsistent": "Inconsistent quality",
-        "stale": "Freshness could improve",
-        "delay": "Delivery delays reported",
-        "less quantity": "Quantity could be more",
-        "not fresh": "Freshness concerns",
-        "overpriced": "Feels overpriced to some",
-        "packaging": "Packaging needs improvement",
-        "average": "Average quality"
-    }
-    
     pros = []
     cons = []
-    
-    for keyword, description in positive_keywords.items():
-        if keyword in text and len(pros) < max_pros:
-            # Check it's not negated
-            idx = text.find(keyword)
-            snippet = text[max(0, idx-20):idx]
-            if not any(neg in snippet for neg in ["not ", "no ", "don't", "doesn't", "wasn't", "isn't"]):
+
+    # One find per keyword gives both presence and the position for the negation check
+    for keyword, description in POSITIVE_KEYWORDS.items():
+        if len(pros) >= max_pros:
+            break
+        idx = text.find(keyword)
+        if idx >= 0:
+            snippet = text[max(0, idx - NEGATION_WINDOW):idx]
+            if not any(neg in snippet for neg in NEGATIONS):
                 pros.append(description)
-    
-    for keyword, description in negative_keywords.items():
-        if keyword in text and len(cons) < max_cons:
+
+    for keyword, description in NEGATIVE_KEYWORDS.items():
+        if len(cons) >= max_cons:
+            break
+        if keyword in text:
             cons.append(description)
-    
+
     if not pros:
         pros = ["Food quality is generally acceptable"]
     if not cons:
         cons = ["No specific complaints identified"]
-    
+
     # Generate suggestion based on cons
     if cons and cons[0] != "No specific complaints identified":
         suggestion = f"Consider addressing: {cons[0].lower()}. Regular feedback collection can help improve service."
     else:
         suggestion = "Continue maintaining current standards and collect more student feedback for improvements."
-    
+
     return pros[:max_pros], cons[:max_cons], suggestion
 
 
+def fallback_pros_cons_batch(contexts: list, max_pros: int = 5, max_cons: int = 5) -> list:
+    """fallback_pros_cons for many contexts at once, in the same order."""
+    return [fallback_pros_cons(c, max_pros, max_cons) for c in contexts]
+
+
+# ================= MAP-REDUCE REVIEW SUMMARIES =================
+
+# Estimated tokens of review text sent in one map call
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 2000))
+# Chunks per tiffin that go to Gemini; later ones are summarized with the keyword fallback,
+# so every review is still counted but the cost and latency of one summary stay bounded
+SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", 32))
+# The short summary is shown as a card's one-liner, so the prompt asks for what the card fits
+SUMMARY_MIN_WORDS = 5
+SUMMARY_MAX_WORDS = 7
+# What fallback_pros_cons returns when it finds nothing; never merged in over real points
+_FALLBACK_FILLERS = {"Food quality is generally acceptable", "No specific complaints identified"}
+DEFAULT_SUGGESTION = "Focus on maintaining food quality and timely delivery based on student feedback."
+
+
+def _split_long_text(text: str, token_budget: int):
+    """Yield pieces of text that fit token_budget, cut at whitespace."""
+    max_chars = token_budget * 4
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield text[:cut]
+        text = text[cut:].lstrip()
+    if text:
+        yield text
+
+
+def _review_chunks(texts, token_budget: int):
+    """Lazily group review texts into chunks of about token_budget tokens; only one is built at a time."""
+    pieces = (
+        piece
+        for text in texts
+        for piece in _split_long_text(str(text or "").strip(), token_budget)
+    )
+    return _iter_chunks_by_tokens(pieces, _estimate_tokens, token_budget, max_items=10 ** 6)
+
+
+def _map_bounded(fn, items):
+    """
+    Yield fn(item) for every item, in order, running up to GEMINI_MAX_CONCURRENCY at once on the
+    shared pool. Items are pulled from the iterable only as slots free up.
+    """
+    if threading.current_thread().name.startswith("gemini"):
+        # Already on the pool: blocking on it from here could starve it
+        for item in items:
+            yield fn(item)
+        return
+    window = deque()
+    for item in items:
+        window.append(_executor.submit(fn, item))
+        if len(window) >= GEMINI_MAX_CONCURRENCY:
+            yield window.popleft().result()
+    while window:
+        yield window.popleft().result()
+
+
+def _clip_words(text: str, max_words: int) -> str:
+    words = str(text or "").split()
+    return " ".join(words[:max_words])
+
+
+class ReviewDigest(BaseModel):
+    """Structured answer for one batch of reviews (map and intermediate reduce steps)."""
+
+    summary: str = ""
+    pros: list[str] = []
+    cons: list[str] = []
+    suggestion: str = ""
+
+    @field_validator("pros", "cons")
+    @classmethod
+    def _drop_blank(cls, items: list) -> list:
+        return [item.strip() for item in items if item and item.strip()]
+
+
+class CategoryBlurbs(BaseModel):
+    """One positive sentence per Top Rated category."""
+
+    budget: str = ""
+    taste: str = ""
+    overall: str = ""
+    veg: str = ""
+    nonveg: str = ""
+
+
+class TiffinInsights(ReviewDigest):
+    """Everything the app shows about one tiffin's reviews, produced by a single Gemini call."""
+
+    category_blurbs: CategoryBlurbs = CategoryBlurbs()
+
+
+# The SDK turns response schemas into its own Schema proto and rejects pydantic field defaults,
+# so requests describe the same shapes with these; answers are still validated with the models above
+class ReviewDigestSchema(TypedDict):
+    summary: str
+    pros: list[str]
+    cons: list[str]
+    suggestion: str
+
+
+class CategoryBlurbsSchema(TypedDict):
+    budget: str
+    taste: str
+    overall: str
+    veg: str
+    nonveg: str
+
+
+class TiffinInsightsSchema(ReviewDigestSchema):
+    category_blurbs: CategoryBlurbsSchema
+
+
+_REQUEST_SCHEMAS = {ReviewDigest: ReviewDigestSchema, TiffinInsights: TiffinInsightsSchema}
+
+
+def _parse_structured(out: str | None, schema):
+    """Validate a structured answer against its pydantic model; None when it does not match."""
+    parsed = _parse_json_output(out or "")
+    if not isinstance(parsed, dict):
+        return None
+    try:
+        return schema.model_validate(parsed)
+    except ValidationError:
+        return None
+
+
+def _parse_partial(out: str | None, schema, max_pros: int, max_cons: int, reviews: int) -> dict | None:
+    """Turn a map/reduce answer into a partial; None unless it has both pros and cons."""
+    digest = _parse_structured(out, schema)
+    if digest is None or not digest.pros or not digest.cons:
+        return None
+    partial = {
+        "reviews": reviews,
+        "summary": _clip_words(digest.summary, SUMMARY_MAX_WORDS),
+        "pros": digest.pros[:max_pros],
+        "cons": digest.cons[:max_cons],
+        "suggestion": digest.suggestion.strip()[:300],
+    }
+    if isinstance(digest, TiffinInsights):
+        partial["category_blurbs"] = {
+            key: _clip_words(text.strip().strip("\"'"), CATEGORY_BLURB_MAX_WORDS)
+            for key, text in digest.category_blurbs.model_dump().items()
+            if text.strip()
+        }
+    return partial
+
+
+CATEGORY_BLURB_MAX_WORDS = 18
+
+_SUMMARY_FIELDS = """Fill in:
+- summary: a {min_words}-{max_words} word phrase on the main taste/quality points
+- pros: up to {max_pros} short positive points students mentioned
+- cons: up to {max_cons} short negative points or complaints students mentioned
+- suggestion: one short actionable suggestion for improvement (1-2 sentences)"""
+
+_BLURB_FIELDS = """- category_blurbs: for each category ONE enthusiastic, student-friendly sentence (10-15 words,
+  no negative points, start directly with the praise) on why students would call this tiffin
+  the best in it. budget: value for money and affordability; taste: deliciousness and food
+  quality; overall: taste, service and value; veg: veg food quality and variety; nonveg: meat
+  quality and flavors"""
+
+
+def _fields_prompt(max_pros: int, max_cons: int, final: bool) -> str:
+    fields = _SUMMARY_FIELDS.format(
+        min_words=SUMMARY_MIN_WORDS, max_words=SUMMARY_MAX_WORDS, max_pros=max_pros, max_cons=max_cons,
+    )
+    return fields + ("\n" + _BLURB_FIELDS if final else "")
+
+
+def _about_prompt(about: dict | None) -> str:
+    if not about:
+        return ""
+    parts = [f"Tiffin: '{about.get('name', 'Unknown')}'"]
+    if about.get("monthly_price") is not None:
+        parts.append(f"monthly price ₹{about['monthly_price']}")
+    if about.get("avg_rating"):
+        parts.append(f"average student rating {about['avg_rating']:.1f}/5")
+    return ", ".join(parts) + "\n"
+
+
+def _summarize_chunk(chunk: list, max_pros: int, max_cons: int, final: bool = False, about: dict | None = None,
+                     site: str | None = None) -> dict:
+    """
+    Map step: pros/cons of one chunk of reviews, from Gemini or the keyword fallback. When the
+    chunk holds every review (`final`), the same call also writes the category blurbs.
+    """
+    reviews = "\n".join(f"- {text}" for text in chunk)
+    prompt = f"""
+Analyze these student reviews about a tiffin service.
+{_about_prompt(about) if final else ""}
+{_fields_prompt(max_pros, max_cons, final)}
+
+Reviews:
+{reviews}
+"""
+    schema = TiffinInsights if final else ReviewDigest
+    partial = _parse_partial(try_gemini(prompt, _REQUEST_SCHEMAS[schema], site), schema, max_pros, max_cons, len(chunk))
+    return partial or _fallback_partial(chunk, max_pros, max_cons)
+
+
+def _fallback_partial(chunk: list, max_pros: int, max_cons: int) -> dict:
+    pros, cons, suggestion = fallback_pros_cons(" ".join(chunk), max_pros, max_cons)
+    return {
+        "reviews": len(chunk),
+        "summary": _clip_words(" ".join(chunk), SUMMARY_MAX_WORDS),
+        "pros": [p for p in pros if p not in _FALLBACK_FILLERS],
+        "cons": [c for c in cons if c not in _FALLBACK_FILLERS],
+        "suggestion": suggestion,
+        "fallback": True,
+    }
+
+
+def _merge_partials_locally(partials: list, max_pros: int, max_cons: int) -> dict:
+    """Reduce without Gemini: keep the points backed by the most reviews, first seen wins ties."""
+    def top(field, limit):
+        weight = {}
+        label = {}
+        for p in partials:
+            for item in p[field]:
+                key = item.strip().lower()
+                weight[key] = weight.get(key, 0) + p["reviews"]
+                label.setdefault(key, item)
+        ranked = sorted(weight, key=lambda k: -weight[k])
+        return [label[k] for k in ranked[:limit]]
+
+    cons = top("cons", max_cons)
+    suggestion = next((p["suggestion"] for p in partials if p["suggestion"] and not p.get("fallback")), "")
+    if not suggestion:
+        suggestion = (
+            f"Consider addressing: {cons[0].lower()}. Regular feedback collection can help improve service."
+            if cons else partials[0]["suggestion"]
+        )
+    return {
+        "reviews": sum(p["reviews"] for p in partials),
+        "summary": next((p["summary"] for p in partials if p["summary"]), ""),
+        "pros": top("pros", max_pros),
+        "cons": cons,
+        "suggestion": suggestion,
+        "fallback": all(p.get("fallback") for p in partials),
+    }
+
+
+def _merge_partials(partials: list, max_pros: int, max_cons: int, final: bool = False, about: dict | None = None,
+                    site: str | None = None) -> dict:
+    """
+    Reduce step: one Gemini call merges a group of partial summaries; falls back to counting.
+    The last merge (`final`) also writes the category blurbs.
+    """
+    if len(partials) == 1:
+        return partials[0]
+    reviews = sum(p["reviews"] for p in partials)
+    if all(p.get("fallback") for p in partials):
+        return _merge_partials_locally(partials, max_pros, max_cons)
+    payload = [{k: p[k] for k in ("reviews", "summary", "pros", "cons", "suggestion")} for p in partials]
+    prompt = f"""
+These are summaries of separate batches of student reviews about the same tiffin service;
+"reviews" is how many reviews each batch covered. Merge them into one summary: combine points
+that mean the same thing and prefer the ones backed by the most reviews.
+{_about_prompt(about) if final else ""}
+{_fields_prompt(max_pros, max_cons, final)}
+
+Batch summaries:
+{json.dumps(payload, ensure_ascii=False)}
+"""
+    schema = TiffinInsights if final else ReviewDigest
+    merged = _parse_partial(try_gemini(prompt, _REQUEST_SCHEMAS[schema], site), schema, max_pros, max_cons, reviews)
+    if merged:
+        return merged
+    merged = _merge_partials_locally(partials, max_pros, max_cons)
+    # Without the final Gemini merge there is no overall summary or blurbs to keep for good
+    merged["fallback"] = merged["fallback"] or final
+    return merged
+
+
+def summarize_reviews(texts, max_pros: int = 5, max_cons: int = 5,
+                      chunk_tokens: int = SUMMARY_CHUNK_TOKENS, max_chunks: int = SUMMARY_MAX_CHUNKS,
+                      about: dict | None = None) -> dict | None:
+    """
+    Map-reduce summary of any number of reviews. `texts` may be a generator; it is consumed one
+    chunk of about `chunk_tokens` at a time. Chunks are summarized in parallel on the Gemini pool
+    (map), then the partial pros/cons are merged in groups that also fit `chunk_tokens` until one
+    is left (reduce). The last call answers with the full TiffinInsights schema, so a tiffin whose
+    reviews fit one chunk costs a single call. `about` (name, monthly_price, avg_rating) gives the
+    category blurbs their context.
+    Returns {"short_summary", "pros", "cons", "suggestion", "category_blurbs", "fallback"}, or None
+    without reviews; "fallback" is True when the final step had to do without Gemini.
+    """
+    # The map and reduce prompts run on pool threads; label them with whoever asked for the summary
+    site = metrics.call_site()
+    chunks = _review_chunks(texts, chunk_tokens)
+    first = next(chunks, None)
+    if first is None:
+        return None
+    second = next(chunks, None)
+
+    if second is None:
+        partials = [_summarize_chunk(first, max_pros, max_cons, final=True, about=about, site=site)]
+    else:
+        def map_chunk(numbered):
+            i, chunk = numbered
+            if i >= max_chunks:
+                return _fallback_partial(chunk, max_pros, max_cons)
+            return _summarize_chunk(chunk, max_pros, max_cons, site=site)
+
+        partials = list(_map_bounded(map_chunk, enumerate(itertools.chain([first, second], chunks))))
+
+    while len(partials) > 1:
+        groups = _chunk_by_tokens(
+            partials, lambda p: _estimate_tokens(json.dumps(p, ensure_ascii=False)), chunk_tokens, max_items=len(partials)
+        )
+        if len(groups) == len(partials):
+            # Each partial alone fills the budget; merge pairs so the reduce still converges
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        final = len(groups) == 1
+        partials = list(_map_bounded(lambda group: _merge_partials(group, max_pros, max_cons, final, about, site), groups))
+
+    result = partials[0]
+    return {
+        "short_summary": result["summary"] or "No reviews yet.",
+        "pros": result["pros"] or ["Students generally find the food acceptable."],
+        "cons": result["cons"] or ["No major complaints reported yet."],
+        "suggestion": result["suggestion"] or DEFAULT_SUGGESTION,
+        "category_blurbs": result.get("category_blurbs") or {},
+        "fallback": bool(result.get("fallback")),
+    }
+
+
 def generate_pros_cons(context: str, max_items: int = 5) -> tuple:
     """
     Legacy function for backward compatibility.
@@ -366,30 +938,10 @@ def generate_improvement_suggestion(context: str) -> str:
     """Generate a short improvement suggestion based on reviews."""
     if not context or not context.strip():
         return "Collect more student reviews to identify areas for improvement."
-    
-    prompt = f"""
-Based on these student reviews, provide ONE short, actionable suggestion (1-2 sentences) for how this tiffin service can improve:
 
-Reviews:
-{context[:1000]}
-
-Suggestion:
-"""
-    
-    out = try_gemini(prompt)
-    if out:
-        # Clean up the response
-        suggestion = out.strip()
-        # Remove any "Suggestion:" prefix if present
-        if suggestion.lower().startswith("suggestion"):
-            parts = suggestion.split(":", 1)
-            if len(parts) > 1:
-                suggestion = parts[1].strip()
-        
-        # Limit length
-        if len(suggestion) > 300:
-            suggestion = suggestion[:297] + "..."
-        
-        return suggestion
-    
+    # Same map-reduce pipeline (and cached prompts) as the pros/cons, so every review counts
+    result = summarize_reviews([context])
+    suggestion = result["suggestion"] if result else ""
+    if suggestion and suggestion != DEFAULT_SUGGESTION:
+        return suggestion if len(suggestion) <= 300 else suggestion[:297] + "..."
     return "Focus on consistency in food quality and timely delivery to improve student satisfaction."
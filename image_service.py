@@ -0,0 +1,250 @@
+import base64
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Streamlit serves <app dir>/static at app/static/ when server.enableStaticServing is on
+IMAGE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "img"))
+IMAGE_URL_PREFIX = os.getenv("IMAGE_URL_PREFIX", "app/static/img")
+
+# name -> (width, height) of the cover-cropped JPEG; the placeholder keeps the aspect ratio
+VARIANTS = {
+    "card": (640, 360),
+    "portrait": (320, 420),
+}
+PLACEHOLDER_WIDTH = 24
+JPEG_QUALITY = 72
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+FETCH_TIMEOUT = 10
+# Provider-supplied URLs are fetched by the server, so only public web addresses are allowed
+ALLOWED_SCHEMES = ("http", "https")
+# IMAGE_ALLOW_LOCAL_SOURCES=1 also allows loopback and private hosts, e.g. a local file server in testing
+ALLOW_LOCAL_SOURCES = os.getenv("IMAGE_ALLOW_LOCAL_SOURCES") == "1"
+# A URL that failed to download or decode is retried after this many seconds
+RETRY_FAILED_AFTER = 3600
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _check_address(ip: str, target: str):
+    if not ALLOW_LOCAL_SOURCES and not ipaddress.ip_address(ip).is_global:
+        raise ValueError(f"image URL points to a non-public address: {target}")
+
+
+def check_url(url: str):
+    """Raise ValueError unless `url` is http(s) on a host that resolves only to public addresses."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme.lower() not in ALLOWED_SCHEMES or not parts.hostname:
+        raise ValueError(f"not an http(s) image URL: {url}")
+    for *_, sockaddr in socket.getaddrinfo(parts.hostname, parts.port, proto=socket.IPPROTO_TCP):
+        _check_address(sockaddr[0], url)
+
+
+def _checked_connection(address, *args, **kwargs):
+    """
+    socket.create_connection that checks the address it actually connected to, so a host that
+    resolves differently after check_url (DNS rebinding) still cannot reach an internal address.
+    """
+    sock = socket.create_connection(address, *args, **kwargs)
+    try:
+        _check_address(sock.getpeername()[0], f"{address[0]}:{address[1]}")
+    except ValueError:
+        sock.close()
+        raise
+    return sock
+
+
+class _CheckedHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _checked_connection
+
+
+class _CheckedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _checked_connection
+
+
+class _CheckedHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_CheckedHTTPConnection, req)
+
+
+class _CheckedHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_CheckedHTTPSConnection, req, context=self._context)
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follow a redirect only to a URL that check_url accepts."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: the peer check has to see the image host itself, not a proxy in front of it
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _CheckedHTTPHandler, _CheckedHTTPSHandler, _CheckedRedirectHandler,
+)
+
+
+def fetch(url: str) -> bytes:
+    check_url(url)
+    req = urllib.request.Request(url, headers={"User-Agent": "right-tiffin-thumbnailer/1.0"})
+    with _opener.open(req, timeout=FETCH_TIMEOUT) as resp:
+        data = resp.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"image larger than {MAX_SOURCE_BYTES} bytes: {url}")
+    return data
+
+
+def make_variants(data: bytes) -> dict:
+    """Return {variant: jpeg bytes} for every entry of VARIANTS plus the tiny "placeholder"."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        out = {}
+        for name, size in VARIANTS.items():
+            buf = io.BytesIO()
+            ImageOps.fit(img, size, Image.LANCZOS).save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            out[name] = buf.getvalue()
+        small = img.copy()
+        small.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+        buf = io.BytesIO()
+        small.save(buf, "JPEG", quality=40)
+        out["placeholder"] = buf.getvalue()
+    return out
+
+
+class ImageService:
+    """
+    Fetches each provider image once, stores resized, compressed variants under their content
+    hash (identical images share files) and remembers which hash every source URL resolved to.
+    Work happens on a small background pool; until a URL is processed the cards show a placeholder.
+    """
+
+    def __init__(self, root: str = IMAGE_DIR, url_prefix: str = IMAGE_URL_PREFIX, max_workers: int = 4):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        os.makedirs(os.path.join(root, "urls"), exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._digests = {}
+        self._placeholders = {}
+
+    def _file(self, digest: str, variant: str) -> str:
+        return os.path.join(self.root, f"{digest}-{variant}.jpg")
+
+    def _url_record(self, url: str) -> str:
+        return os.path.join(self.root, "urls", _url_key(url))
+
+    def _write(self, path: str, data: bytes):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def lookup(self, url: str) -> str | None:
+        """Content hash the URL was stored under, or None if it has not been processed (or failed)."""
+        if url in self._digests:
+            return self._digests[url]
+        try:
+            with open(self._url_record(url), "r", encoding="utf-8") as f:
+                record = f.read().strip()
+        except OSError:
+            return None
+        if record.startswith("error:"):
+            return None
+        self._digests[url] = record
+        return record
+
+    def _failed_recently(self, url: str) -> bool:
+        try:
+            with open(self._url_record(url), "r", encoding="utf-8") as f:
+                record = f.read().strip()
+        except OSError:
+            return False
+        return record.startswith("error:") and time.time() - float(record[6:]) < RETRY_FAILED_AFTER
+
+    def process(self, url: str) -> str | None:
+        """Download, resize and store one image synchronously. Returns its content hash."""
+        try:
+            data = fetch(url)
+            digest = content_hash(data)
+            if not all(os.path.exists(self._file(digest, v)) for v in list(VARIANTS) + ["placeholder"]):
+                for variant, jpeg in make_variants(data).items():
+                    self._write(self._file(digest, variant), jpeg)
+            self._write(self._url_record(url), digest.encode("utf-8"))
+            return digest
+        except Exception:
+            self._write(self._url_record(url), f"error:{time.time()}".encode("utf-8"))
+            return None
+
+    def _process_in_background(self, url: str):
+        try:
+            self.process(url)
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+    def prefetch(self, urls):
+        """Queue the given URLs for processing unless they are stored, queued or recently failed."""
+        for url in urls:
+            if not url or self.lookup(url) or self._failed_recently(url):
+                continue
+            with self._lock:
+                if url in self._pending:
+                    continue
+                self._pending.add(url)
+            self._pool.submit(self._process_in_background, url)
+
+    def variant_url(self, url: str, variant: str) -> str | None:
+        """Served URL of a stored variant; queues the source and returns None while it is not ready."""
+        digest = self.lookup(url)
+        if digest is None:
+            self.prefetch([url])
+            return None
+        return f"{self.url_prefix}/{digest}-{variant}.jpg"
+
+    def placeholder(self, url: str) -> str | None:
+        """Tiny blurred preview as a data URI, small enough to inline in the card HTML."""
+        digest = self.lookup(url)
+        if digest is None:
+            return None
+        if digest not in self._placeholders:
+            try:
+                with open(self._file(digest, "placeholder"), "rb") as f:
+                    self._placeholders[digest] = "data:image/jpeg;base64," + base64.b64encode(f.read()).decode("ascii")
+            except OSError:
+                return None
+        return self._placeholders[digest]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_image_service() -> ImageService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ImageService()
+    return _service
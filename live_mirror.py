@@ -0,0 +1,83 @@
+import threading
+
+
+class CollectionMirror:
+    """
+    In-memory copy of one Firestore collection, kept current by an on_snapshot listener.
+    The first snapshot loads every document; after that Firestore only sends the documents
+    that changed, so reads scale with writes instead of with page views.
+    Optionally keeps a secondary index on one field (e.g. reviews by tiffin_id).
+    """
+
+    def __init__(self, collection_ref, index_field: str | None = None):
+        self.name = collection_ref.id
+        self.index_field = index_field
+        self._docs = {}
+        self._index = {}
+        # Bumped on every change, so readers can tell whether anything they derived is stale
+        self.version = 0
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._watch = collection_ref.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        with self._lock:
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    self.remove(change.document.id)
+                else:
+                    self.put(change.document.id, change.document.to_dict() or {})
+        self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """True once the initial snapshot has arrived and the listener is still running."""
+        return self._ready.is_set() and getattr(self._watch, "is_active", True)
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def close(self):
+        self._watch.unsubscribe()
+        self._ready.clear()
+
+    def put(self, doc_id: str, data: dict):
+        """Store a document; also used to apply this process's own writes before the listener sees them."""
+        with self._lock:
+            self.remove(doc_id)
+            self._docs[doc_id] = data
+            self.version += 1
+            if self.index_field is not None:
+                self._index.setdefault(data.get(self.index_field), set()).add(doc_id)
+
+    def merge(self, doc_id: str, fields: dict):
+        with self._lock:
+            if doc_id in self._docs:
+                data = dict(self._docs[doc_id])
+                data.update(fields)
+                self.put(doc_id, data)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            data = self._docs.pop(doc_id, None)
+            if data is not None:
+                self.version += 1
+            if data is not None and self.index_field is not None:
+                ids = self._index.get(data.get(self.index_field))
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del self._index[data.get(self.index_field)]
+
+    def get(self, doc_id: str) -> dict | None:
+        return self._docs.get(doc_id)
+
+    def items(self) -> list:
+        """[(doc_id, data)] ordered by id, like a collection stream. The dicts are shared; do not mutate."""
+        with self._lock:
+            return sorted(self._docs.items())
+
+    def items_where(self, value) -> list:
+        """Documents whose index_field equals value, ordered by id."""
+        with self._lock:
+            return sorted((doc_id, self._docs[doc_id]) for doc_id in self._index.get(value, ()))
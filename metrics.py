@@ -0,0 +1,213 @@
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "firestore": "Firestore operations issued through firestore_db",
+    "gemini": "Gemini prompts sent through try_gemini",
+}
+
+
+class MetricsRegistry:
+    """
+    Process-wide call counters and latency histograms for Firestore and Gemini, labelled by
+    system, operation, kind and call site (the function that made the call).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (system, op, kind, site, outcome) -> count
+            self._calls = {}
+            # (system, op, kind, site) -> [per-bucket counts..., +Inf count], sum of seconds
+            self._latency = {}
+
+    def record(self, system: str, op: str, kind: str, site: str, outcome: str, seconds: float):
+        key = (system, op, kind, site)
+        with self._lock:
+            self._calls[key + (outcome,)] = self._calls.get(key + (outcome,), 0) + 1
+            hist = self._latency.get(key)
+            if hist is None:
+                hist = self._latency[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            i = 0
+            while i < len(self.buckets) and seconds > self.buckets[i]:
+                i += 1
+            hist[0][i] += 1
+            hist[1] += seconds
+
+    def _quantile(self, counts: list, q: float) -> float:
+        target = q * sum(counts)
+        seen = 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def rows(self) -> list:
+        """One dict per (system, op, kind, site), worst total time first, for the debug panel."""
+        with self._lock:
+            calls = dict(self._calls)
+            latency = {k: (list(v[0]), v[1]) for k, v in self._latency.items()}
+        rows = []
+        for key, (counts, total) in latency.items():
+            outcomes = {o: n for (*k, o), n in calls.items() if tuple(k) == key}
+            n = sum(counts)
+            rows.append({
+                "system": key[0],
+                "op": key[1],
+                "kind": key[2],
+                "site": key[3],
+                "calls": n,
+                "errors": outcomes.get("error", 0),
+                "cached": outcomes.get("cached", 0),
+                "avg_ms": round(1000 * total / n, 1) if n else 0.0,
+                "p95_ms": round(1000 * self._quantile(counts, 0.95), 1),
+                "total_s": round(total, 3),
+            })
+        rows.sort(key=lambda r: -r["total_s"])
+        return rows
+
+    def prometheus_text(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            calls = dict(self._calls)
+            latency = {k: (list(v[0]), v[1]) for k, v in self._latency.items()}
+
+        lines = []
+        for system in sorted({k[0] for k in latency}):
+            name = f"{system}_calls_total"
+            lines.append(f"# HELP {name} {HELP.get(system, system)}, by outcome.")
+            lines.append(f"# TYPE {name} counter")
+            for (sys_, op, kind, site, outcome), n in sorted(calls.items()):
+                if sys_ == system:
+                    lines.append(f"{name}{_labels(op=op, kind=kind, site=site, outcome=outcome)} {n}")
+
+            name = f"{system}_call_duration_seconds"
+            lines.append(f"# HELP {name} Latency of {HELP.get(system, system)}.")
+            lines.append(f"# TYPE {name} histogram")
+            for (sys_, op, kind, site), (counts, total) in sorted(latency.items()):
+                if sys_ != system:
+                    continue
+                cumulative = 0
+                for bound, n in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(op=op, kind=kind, site=site, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(op=op, kind=kind, site=site)} {total}")
+                lines.append(f"{name}_count{_labels(op=op, kind=kind, site=site)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+registry = MetricsRegistry()
+
+
+def call_site(depth: int = 2) -> str:
+    """
+    Name of the function `depth` frames up from here; 2 is the caller of the function calling this.
+    Module-level code is labelled with the module's file name, e.g. "app".
+    """
+    try:
+        frame = sys._getframe(depth)
+    except ValueError:
+        return "unknown"
+    name = frame.f_code.co_name
+    if name == "<module>":
+        name = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return name
+
+
+class _Call:
+    def __init__(self):
+        self.outcome = "ok"
+
+
+@contextmanager
+def track(system: str, op: str, kind: str, site: str):
+    """Time the block and record it; set `.outcome` on the yielded object to label it otherwise."""
+    call = _Call()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = "error"
+        raise
+    finally:
+        registry.record(system, op, kind, site, call.outcome, time.perf_counter() - start)
+
+
+_active = threading.local()
+
+
+def instrument(system: str, kind: str):
+    """
+    Decorator recording each call of a data-access function under its own name, labelled with
+    the function that called it. Calls made from inside another instrumented call of the same
+    system are not recorded again, so counts match what the callers asked for.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_active, system, False):
+                return func(*args, **kwargs)
+            setattr(_active, system, True)
+            try:
+                with track(system, func.__name__, kind, call_site()):
+                    return func(*args, **kwargs)
+            finally:
+                setattr(_active, system, False)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int, host: str = "127.0.0.1"):
+    """Serve GET /metrics in Prometheus text format from a daemon thread; once per process."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            # Another process (or an earlier script run) already owns the port
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
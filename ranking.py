@@ -0,0 +1,190 @@
+# Vectorized tiffin ranking: one pandas frame of per-tiffin features, every category scored
+# with NumPy in a single pass. Used by Top Rated and the student dashboard.
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Weights of each 0-10 feature in a category score. Override any of them with RANKING_WEIGHTS,
+# e.g. RANKING_WEIGHTS='{"overall": {"ai": 0.6, "rating": 0.2, "price": 0.2}}'
+WEIGHTS = {
+    # ai score, user rating and review price (lower is better)
+    "overall": {"ai": 0.5, "rating": 0.3, "price": 0.2},
+    # low monthly cost but a decent rating
+    "budget": {"monthly": 0.8, "rating": 0.2},
+}
+try:
+    for _category, _weights in json.loads(os.getenv("RANKING_WEIGHTS") or "{}").items():
+        WEIGHTS.setdefault(_category, {}).update(_weights)
+except Exception:
+    pass
+
+# Best Taste only considers tiffins at or above this AI score while any exist
+TASTE_MIN_AI = 7.0
+CATEGORIES = ("budget", "taste", "overall", "veg", "nonveg")
+
+FRAME_COLUMNS = ["name", "food_type", "reviews", "avg_rating", "avg_ai", "price", "price_min", "price_max", "monthly"]
+
+
+def build_frame(tiffins: dict, stats: dict) -> pd.DataFrame:
+    """
+    One row per tiffin in `tiffins` ({id: data}), in that order, joined with its tiffin_stats.
+    Tiffins without reviews get zero averages and no review price.
+    """
+    ids = list(tiffins)
+    if not ids:
+        return pd.DataFrame(columns=FRAME_COLUMNS, index=pd.Index([], name="tid"))
+
+    def column(source: dict, field: str, default=None):
+        return [(source.get(i) or {}).get(field, default) for i in ids]
+
+    def numeric(values) -> np.ndarray:
+        try:
+            # None becomes NaN; only text values need the slower coercion
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+    count = np.nan_to_num(numeric(column(stats, "count", 0)))
+    price_count = np.nan_to_num(numeric(column(stats, "price_count", 0)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_rating = np.where(count > 0, numeric(column(stats, "rating_sum", 0.0)) / count, 0.0)
+        avg_ai = np.where(count > 0, numeric(column(stats, "ai_sum", 0.0)) / count, 0.0)
+        price = np.where((count > 0) & (price_count > 0), numeric(column(stats, "price_sum", 0.0)) / price_count, np.nan)
+
+    # Prefer the listed monthly price; fall back to the average review price
+    monthly = numeric(column(tiffins, "price_monthly"))
+    monthly = np.where(np.isnan(monthly), price, monthly)
+
+    return pd.DataFrame(
+        {
+            "name": column(tiffins, "name", "Unknown"),
+            "food_type": [str(v or "").lower() for v in column(tiffins, "food_type", "")],
+            "reviews": count.astype(int),
+            "avg_rating": np.nan_to_num(avg_rating),
+            "avg_ai": np.nan_to_num(avg_ai),
+            "price": price,
+            "price_min": numeric(column(stats, "price_min")),
+            "price_max": numeric(column(stats, "price_max")),
+            "monthly": monthly,
+        },
+        index=pd.Index(ids, name="tid"),
+    )
+
+
+def _cheapness(prices: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Scale prices to 0-10 with the cheapest at 10; unknown prices, or no spread at all, score 5."""
+    if np.isnan(low) or np.isnan(high) or low == high:
+        return np.full(len(prices), 5.0)
+    return np.where(np.isnan(prices), 5.0, (high - prices) / (high - low) * 10)
+
+
+def _weighted(features: dict, weights: dict) -> np.ndarray:
+    return sum(weight * features[name] for name, weight in weights.items())
+
+
+def score(frame: pd.DataFrame, weights: dict | None = None) -> pd.DataFrame:
+    """Add the 0-10 feature columns and the `combined` and `budget` scores to a copy of the frame."""
+    weights = {**WEIGHTS, **(weights or {})}
+    frame = frame.copy()
+    if frame.empty:
+        for col in ("rating_scaled", "price_score", "monthly_score", "combined", "budget"):
+            frame[col] = pd.Series(dtype=float)
+        return frame
+
+    avg_rating = frame["avg_rating"].to_numpy(dtype=float)
+    # rating 1-5 scaled to 0-10; unrated tiffins score 0
+    rating_scaled = np.where(avg_rating > 0, (avg_rating - 1) / 4 * 10, 0.0)
+    # review prices are normalised across every review's range, monthly prices across the listed ones
+    price_min, price_max = frame["price_min"].to_numpy(dtype=float), frame["price_max"].to_numpy(dtype=float)
+    price_score = _cheapness(
+        frame["price"].to_numpy(dtype=float),
+        np.nanmin(price_min) if not np.isnan(price_min).all() else np.nan,
+        np.nanmax(price_max) if not np.isnan(price_max).all() else np.nan,
+    )
+    monthly = frame["monthly"].to_numpy(dtype=float)
+    has_monthly = not np.isnan(monthly).all()
+    monthly_score = _cheapness(
+        monthly,
+        np.nanmin(monthly) if has_monthly else np.nan,
+        np.nanmax(monthly) if has_monthly else np.nan,
+    )
+
+    features = {
+        "ai": frame["avg_ai"].to_numpy(dtype=float),
+        "rating": rating_scaled,
+        "price": price_score,
+        "monthly": monthly_score,
+    }
+    frame["rating_scaled"] = rating_scaled
+    frame["price_score"] = price_score
+    frame["monthly_score"] = monthly_score
+    frame["combined"] = _weighted(features, weights["overall"])
+    frame["budget"] = _weighted(features, weights["budget"])
+    return frame
+
+
+def top_k(values, k: int, mask=None) -> np.ndarray:
+    """
+    Positions of the k largest values (restricted to `mask`), best first. A partial selection
+    (np.partition) finds the cut-off so only the winners are sorted; ties keep frame order,
+    like max() over a list.
+    """
+    values = np.asarray(values, dtype=float)
+    positions = np.arange(len(values)) if mask is None else np.flatnonzero(mask)
+    if k <= 0 or not len(positions):
+        return positions[:0]
+    candidates = values[positions]
+    if k < len(positions):
+        # The k-th largest value; keep everything strictly above it plus the earliest ties
+        kth = np.partition(candidates, len(candidates) - k)[len(candidates) - k]
+        above = np.flatnonzero(candidates > kth)
+        ties = np.flatnonzero(candidates == kth)[: k - len(above)]
+        keep = np.concatenate([above, ties])
+    else:
+        keep = np.arange(len(positions))
+    order = np.lexsort((keep, -candidates[keep]))
+    return positions[keep[order]]
+
+
+def category_winners(frame: pd.DataFrame, k: int = 1, weights: dict | None = None) -> dict:
+    """Return {category: [entry dicts, best first]} for every category in CATEGORIES."""
+    scored = score(frame, weights)
+    food = scored["food_type"].tolist()
+    is_nonveg = np.fromiter(("non" in f for f in food), dtype=bool, count=len(food))
+    is_veg = np.fromiter(("veg" in f for f in food), dtype=bool, count=len(food)) & ~is_nonveg
+    avg_ai = scored["avg_ai"].to_numpy(dtype=float)
+    tasty = avg_ai >= TASTE_MIN_AI
+    combined = scored["combined"].to_numpy(dtype=float)
+
+    picks = {
+        "budget": top_k(scored["budget"].to_numpy(dtype=float), k),
+        "taste": top_k(avg_ai, k, tasty if tasty.any() else None),
+        "overall": top_k(combined, k),
+        "veg": top_k(combined, k, is_veg),
+        "nonveg": top_k(combined, k, is_nonveg),
+    }
+    return {category: entries(scored, positions) for category, positions in picks.items()}
+
+
+def entries(scored: pd.DataFrame, positions) -> list:
+    """Rows of a scored frame as the dicts the Top Rated cards render."""
+    columns = {col: scored[col].to_numpy()[positions] for col in ("name", "combined", "avg_ai", "avg_rating", "price", "monthly", "food_type")}
+    out = []
+    for i, tid in enumerate(scored.index[positions]):
+        out.append({
+            "tid": tid,
+            "name": columns["name"][i],
+            "combined": float(columns["combined"][i]),
+            "avg_ai": float(columns["avg_ai"][i]),
+            "avg_rating": float(columns["avg_rating"][i]),
+            "price": None if np.isnan(columns["price"][i]) else float(columns["price"][i]),
+            "monthly": None if np.isnan(columns["monthly"][i]) else _plain_number(columns["monthly"][i]),
+            "food_type": columns["food_type"][i],
+        })
+    return out
+
+
+def _plain_number(value: float):
+    return int(value) if float(value).is_integer() else float(value)
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "right_tiffin_gemini_cache.sqlite3")
+# Reads only SELECT; hit/miss counts and last-access times are written in one batch this often
+FLUSH_SECONDS = 30
+
+
+def cache_key(prompt: str, model_name: str) -> str:
+    """Content address for a prompt sent to a given model."""
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of Gemini responses, shared by every session and process on the host.
+    Entries expire after `ttl` seconds and the least recently used ones are evicted
+    once more than `max_entries` are stored. Lookups take no write lock: their counters and
+    last-access times are kept in memory and flushed at most every `flush_seconds`.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_entries: int = 5000, flush_seconds: float = FLUSH_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_seconds = flush_seconds
+        self._pending_lock = threading.Lock()
+        self._pending = {"hits": 0, "misses": 0}
+        self._touched = {}
+        self._flushed_at = time.monotonic()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the cache safe across threads and processes.
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, prompt: str, model_name: str):
+        """Return the cached response or None. Expired entries are left for set() to evict."""
+        key = cache_key(prompt, model_name)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        hit = row is not None and now - row[1] <= self.ttl
+        with self._pending_lock:
+            self._pending["hits" if hit else "misses"] += 1
+            if hit:
+                self._touched[key] = now
+        self._maybe_flush()
+        return row[0] if hit else None
+
+    def _maybe_flush(self, force: bool = False):
+        with self._pending_lock:
+            if not force and time.monotonic() - self._flushed_at < self.flush_seconds:
+                return
+            pending, touched = self._pending, self._touched
+            self._pending, self._touched = {"hits": 0, "misses": 0}, {}
+            self._flushed_at = time.monotonic()
+        try:
+            with self._connect() as conn:
+                conn.executemany("UPDATE counters SET value = value + ? WHERE name = ?", [(v, k) for k, v in pending.items()])
+                conn.executemany("UPDATE responses SET last_access = MAX(last_access, ?) WHERE key = ?", [(t, k) for k, t in touched.items()])
+        except sqlite3.Error:
+            # Busy database: keep the numbers for the next flush
+            with self._pending_lock:
+                for k, v in pending.items():
+                    self._pending[k] += v
+                for k, t in touched.items():
+                    self._touched[k] = max(t, self._touched.get(k, 0))
+
+    def set(self, prompt: str, model_name: str, response: str):
+        key = cache_key(prompt, model_name)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        expired = conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+        else:
+            overflow = 0
+        if expired or overflow:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (expired + overflow,))
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the current number of entries."""
+        self._maybe_flush(force=True)
+        with self._connect() as conn:
+            out = {name: value for name, value in conn.execute("SELECT name, value FROM counters")}
+            out["entries"] = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return out
+
+    def clear(self):
+        with self._pending_lock:
+            self._pending, self._touched = {"hits": 0, "misses": 0}, {}
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+_cache = None
+
+
+def get_response_cache():
+    """Return the process-wide cache, or None when disabled with GEMINI_CACHE_DISABLED=1."""
+    global _cache
+    if os.getenv("GEMINI_CACHE_DISABLED") == "1":
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            os.getenv("GEMINI_CACHE_PATH", DEFAULT_CACHE_PATH),
+            ttl=float(os.getenv("GEMINI_CACHE_TTL", 24 * 3600)),
+            max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", 5000)),
+        )
+    return _cache
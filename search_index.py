@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+INDEXED_FIELDS = ("name", "description", "location", "delivery_locations")
+NAME_FIELDS = ("name", "description")
+# Derived field: the delivery areas, or the tiffin's own location when it lists none
+SERVICE_AREA = "service_area"
+LOCATION_FIELDS = (SERVICE_AREA,)
+
+# A match in the name counts for more than one in the description or delivery areas
+FIELD_WEIGHTS = {"name": 1.0, "location": 0.9, "delivery_locations": 0.8, SERVICE_AREA: 0.8, "description": 0.5}
+
+
+def _normalize(value) -> str:
+    if isinstance(value, (list, tuple)):
+        value = " | ".join(str(v) for v in value if v)
+    return " ".join(str(value or "").lower().split())
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of every word, padded so short words and word starts still match."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """
+    In-memory fuzzy index over tiffin text fields. Postings map each trigram to the
+    (tiffin_id, field) pairs containing it, so a search touches only the postings of the
+    query's own trigrams, independent of catalogue size.
+    """
+
+    def __init__(self, min_score: float = 0.45):
+        self.min_score = min_score
+        self._lock = threading.RLock()
+        self._postings = defaultdict(set)
+        self._texts = {}
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, tiffin_id: str, data: dict):
+        """Index (or re-index) the given fields of a tiffin; fields not present keep their old text."""
+        with self._lock:
+            texts = dict(self._texts.get(tiffin_id, {}))
+            for field in INDEXED_FIELDS:
+                if field in data:
+                    texts[field] = _normalize(data.get(field))
+            texts[SERVICE_AREA] = texts.get("delivery_locations") or texts.get("location", "")
+            self.remove(tiffin_id)
+            self._texts[tiffin_id] = texts
+            for field, text in texts.items():
+                for gram in trigrams(text):
+                    self._postings[gram].add((tiffin_id, field))
+
+    def remove(self, tiffin_id: str):
+        with self._lock:
+            texts = self._texts.pop(tiffin_id, None)
+            if not texts:
+                return
+            for field, text in texts.items():
+                for gram in trigrams(text):
+                    entries = self._postings.get(gram)
+                    if entries is not None:
+                        entries.discard((tiffin_id, field))
+                        if not entries:
+                            del self._postings[gram]
+
+    def search(self, query: str, fields=INDEXED_FIELDS, limit: int | None = None) -> list:
+        """
+        Return [(tiffin_id, score)] best first. The score is the weighted share of the query's
+        trigrams found in the best matching field, plus a bonus for an exact substring match.
+        """
+        norm = _normalize(query)
+        grams = trigrams(norm)
+        if not grams:
+            return []
+        with self._lock:
+            hits = defaultdict(int)
+            for gram in grams:
+                for tiffin_id, field in self._postings.get(gram, ()):
+                    if field in fields:
+                        hits[(tiffin_id, field)] += 1
+
+            scores = {}
+            for (tiffin_id, field), shared in hits.items():
+                score = shared / len(grams)
+                if score < self.min_score:
+                    continue
+                if norm in self._texts[tiffin_id].get(field, ""):
+                    score += 0.5
+                score *= FIELD_WEIGHTS.get(field, 1.0)
+                if score > scores.get(tiffin_id, 0.0):
+                    scores[tiffin_id] = score
+
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return ranked[:limit] if limit else ranked
+
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+# Rebuild now and then so tiffins written by other processes are picked up
+REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", 600))
+
+
+def get_search_index() -> TrigramIndex:
+    """Return the process-wide index, building it from Firestore on first use."""
+    global _index, _built_at
+    with _build_lock:
+        if _index is None or time.monotonic() - _built_at > REFRESH_SECONDS:
+            import firestore_db
+
+            index = TrigramIndex()
+            for tid, data in firestore_db.list_tiffins(list(INDEXED_FIELDS)):
+                index.add(tid, data)
+            _index = index
+            _built_at = time.monotonic()
+        return _index
+
+
+def on_tiffin_written(tiffin_id: str, data: dict | None):
+    """Keep the index in step with a tiffin write in this process; data None means deleted."""
+    if _index is None:
+        return
+    if data is None:
+        _index.remove(tiffin_id)
+    else:
+        _index.add(tiffin_id, data)
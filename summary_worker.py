@@ -0,0 +1,123 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+import firestore_db
+from gemini_ai import summarize_reviews
+from tiffin_stats import averages
+
+# Bump when the stored summary gains fields or its prompt changes, so existing documents are
+# recomputed once
+SUMMARY_VERSION = 3
+# A summary made without Gemini (outage, errors) is recomputed after this many seconds
+SUMMARY_RETRY_SECONDS = float(os.getenv("SUMMARY_RETRY_SECONDS", 600))
+
+
+def review_fingerprint(stats: dict | None) -> str:
+    """
+    Fingerprint of a tiffin's review set, taken from its tiffin_stats document.
+    Any review added, edited or deleted changes the count, the sums or updated_at.
+    """
+    if not stats or not stats.get("count"):
+        return "empty"
+    parts = [SUMMARY_VERSION] + [stats.get(k) for k in ("count", "rating_sum", "ai_sum", "price_sum", "updated_at")]
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def compute_summary(tiffin_id: str) -> dict:
+    """
+    Summarize all of one tiffin's current reviews, streamed in chunks: short summary, pros, cons,
+    suggestion and the Top Rated category blurbs come from one structured Gemini call per chunk.
+    """
+    try:
+        tiffin = firestore_db.get_tiffins([tiffin_id], ["name", "price_monthly"]).get(tiffin_id) or {}
+        avg_rating, _, _ = averages(firestore_db.get_stats(tiffin_id))
+        about = {"name": tiffin.get("name", "Unknown"), "monthly_price": tiffin.get("price_monthly"), "avg_rating": avg_rating}
+        summary = summarize_reviews(firestore_db.iter_review_texts(tiffin_id), 5, 5, about=about)
+    except Exception:
+        return {
+            "short_summary": "Summary unavailable right now.",
+            "pros": ["Error analyzing reviews"],
+            "cons": ["Error analyzing reviews"],
+            "suggestion": "Please try again later.",
+            "fallback": True,
+        }
+    if summary is None:
+        return {
+            "short_summary": "No reviews yet. Be the first to review!",
+            "pros": ["No reviews yet."],
+            "cons": ["No reviews yet."],
+            "suggestion": "Collect student reviews to get insights.",
+        }
+    return summary
+
+
+class SummaryWorker:
+    """Single background thread that (re)computes tiffin summaries outside the render loop."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+        self._thread.start()
+
+    def request(self, tiffin_id: str, fingerprint: str):
+        """Queue a recompute unless one is already pending for this tiffin."""
+        with self._lock:
+            if tiffin_id in self._pending:
+                return
+            self._pending.add(tiffin_id)
+        self._queue.put((tiffin_id, fingerprint))
+
+    def _run(self):
+        while True:
+            tiffin_id, fingerprint = self._queue.get()
+            try:
+                summary = compute_summary(tiffin_id)
+                summary["fingerprint"] = fingerprint
+                if summary.pop("fallback", False):
+                    summary["retry_after"] = time.time() + SUMMARY_RETRY_SECONDS
+                firestore_db.set_summary(tiffin_id, summary)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._pending.discard(tiffin_id)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> SummaryWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SummaryWorker()
+    return _worker
+
+
+def get_summaries(stats_by_id: dict) -> dict:
+    """
+    Return {tiffin_id: stored summary or None} for tiffins with reviews, fetched in one batch.
+    When a stored summary no longer matches its review set, or was made without Gemini and is due
+    for a retry, a recompute is queued and the previous summary is returned until the new one is
+    written; None means the first one is pending.
+    """
+    ids = [tid for tid, stats in stats_by_id.items() if stats and stats.get("count")]
+    stored = firestore_db.get_summaries(ids)
+    out = {}
+    now = time.time()
+    for tid in ids:
+        fingerprint = review_fingerprint(stats_by_id[tid])
+        summary = stored.get(tid)
+        if (
+            not summary
+            or summary.get("fingerprint") != fingerprint
+            or now >= summary.get("retry_after", float("inf"))
+        ):
+            get_worker().request(tid, fingerprint)
+        out[tid] = summary
+    return out
@@ -0,0 +1,103 @@
+# Tiffin search, category winners and review submission, shared by the Streamlit app and api.py
+import threading
+
+import firestore_db
+from gemini_ai import analyze_review
+from search_index import LOCATION_FIELDS, NAME_FIELDS, get_search_index
+
+
+def search_by_name(
+    name: str,
+    food_type: str | None = None,
+    max_monthly: float | None = None,
+    location: str | None = None,
+    limit: int = 10,
+    start: int = 0,
+    batch_size: int | None = None,
+) -> tuple:
+    """
+    Tiffins ranked by fuzzy name match in the search index, with the same filters as
+    firestore_db.list_tiffins_page. From position `start` of the ranking, documents are fetched
+    `batch_size` at a time until `limit` rows pass the filters.
+    Returns ([(tiffin_id, data)], position to continue from, or None when the ranking is exhausted).
+    """
+    if start < 0:
+        raise ValueError("start must not be negative")
+    index = get_search_index()
+    ranked = [tid for tid, _ in index.search(name, fields=NAME_FIELDS)]
+    if location:
+        nearby = {tid for tid, _ in index.search(location, fields=LOCATION_FIELDS)}
+        ranked = [tid for tid in ranked if tid in nearby]
+
+    batch_size = batch_size or limit
+    rows = []
+    pos = start
+    while len(rows) < limit and pos < len(ranked):
+        chunk = ranked[pos:pos + batch_size]
+        docs = firestore_db.get_tiffins(chunk)
+        for tid in chunk:
+            if len(rows) == limit:
+                break
+            pos += 1
+            data = docs.get(tid)
+            if data is None:
+                continue
+            if food_type and data.get("food_type") != food_type:
+                continue
+            if max_monthly and float(data.get("price_monthly") or 0) > float(max_monthly):
+                continue
+            rows.append((tid, data))
+    return rows, (pos if pos < len(ranked) else None)
+
+
+_winners = {}
+_winners_lock = threading.Lock()
+
+
+def category_winners(k: int = 1):
+    """
+    Return ({category: [entries, best first]}, {tiffin_id: stats} of the listed tiffins) over every
+    reviewed tiffin, or None before the first review. Shared by the whole process and reused until
+    the live mirror sees a tiffin, review or stats change; recomputed every call without the mirror.
+    """
+    version = firestore_db.data_version()
+    with _winners_lock:
+        cached = _winners.get(k)
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+
+    import ranking
+
+    # Score every reviewed tiffin on AI score (0-10), user rating (1-5) and price (lower is better)
+    stats = firestore_db.get_all_stats()
+    result = None
+    if stats:
+        # One batched read of the tiffin metadata needed for category selection
+        tiffin_meta = firestore_db.get_tiffins(list(stats), firestore_db.TIFFIN_RANKING_FIELDS)
+        winners = ranking.category_winners(ranking.build_frame(tiffin_meta, stats), k)
+        result = winners, {e["tid"]: stats[e["tid"]] for top in winners.values() for e in top}
+    with _winners_lock:
+        _winners[k] = (version, result)
+    return result
+
+
+def submit_review(tiffin_id: str, user_id: str, rating: int, review: str, price=None) -> dict:
+    """
+    Score a review (Gemini, or the rule-based fallback) and save it together with its tiffin_stats
+    update. A user's second review of a tiffin replaces the first.
+    Returns {"updated": replaced an earlier review, "ai_score", "ai_summary", "stats": the tiffin's
+    aggregates including this review}.
+    """
+    ai_score, ai_summary = analyze_review(review, price)
+    payload = {
+        "tiffin_id": tiffin_id,
+        "user_id": user_id,
+        "rating": rating,
+        "review": review,
+        "ai_score": ai_score,
+        "ai_summary": ai_summary,
+        "price": price,
+    }
+    # Writes the review and its tiffin_stats aggregate in one transaction
+    updated, stats = firestore_db.save_review(tiffin_id, user_id, payload)
+    return {"updated": bool(updated), "ai_score": ai_score, "ai_summary": ai_summary, "stats": stats}
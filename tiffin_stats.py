@@ -0,0 +1,66 @@
+# Pure aggregate math for the per-tiffin `tiffin_stats` documents; Firestore I/O lives in firestore_db.
+
+
+def _num(value):
+    try:
+        return float(value) if value is not None else None
+    except Exception:
+        return None
+
+
+def empty_stats(tiffin_id: str) -> dict:
+    return {
+        "tiffin_id": tiffin_id,
+        "count": 0,
+        "rating_sum": 0.0,
+        "ai_sum": 0.0,
+        "price_sum": 0.0,
+        "price_count": 0,
+        "price_min": None,
+        "price_max": None,
+    }
+
+
+def _add(stats: dict, review: dict, sign: int):
+    stats["count"] += sign
+    stats["rating_sum"] += sign * (_num(review.get("rating")) or 0.0)
+    stats["ai_sum"] += sign * (_num(review.get("ai_score")) or 0.0)
+    price = _num(review.get("price"))
+    if price is not None:
+        stats["price_sum"] += sign * price
+        stats["price_count"] += sign
+        if sign > 0:
+            stats["price_min"] = price if stats["price_min"] is None else min(stats["price_min"], price)
+            stats["price_max"] = price if stats["price_max"] is None else max(stats["price_max"], price)
+
+
+def apply_review_change(stats: dict, old_review: dict | None, new_review: dict | None) -> bool:
+    """
+    Update `stats` in place for a review being added (old is None), updated or deleted (new is None).
+    Returns True when a removed price was the current min or max, so the bounds must be rescanned.
+    """
+    rescan = False
+    if old_review:
+        _add(stats, old_review, -1)
+        old_price = _num(old_review.get("price"))
+        new_price = _num(new_review.get("price")) if new_review else None
+        if old_price is not None and old_price != new_price and old_price in (stats["price_min"], stats["price_max"]):
+            rescan = True
+    if new_review:
+        _add(stats, new_review, +1)
+    return rescan
+
+
+def rescan_price_bounds(stats: dict, reviews):
+    prices = [p for p in (_num(r.get("price")) for r in reviews) if p is not None]
+    stats["price_min"] = min(prices) if prices else None
+    stats["price_max"] = max(prices) if prices else None
+
+
+def averages(stats: dict | None) -> tuple:
+    """Return (avg_rating, avg_ai, avg_price) for a stats document; avg_price is None without prices."""
+    if not stats or not stats.get("count"):
+        return 0.0, 0.0, None
+    count = stats["count"]
+    avg_price = stats["price_sum"] / stats["price_count"] if stats.get("price_count") else None
+    return stats["rating_sum"] / count, stats["ai_sum"] / count, avg_price